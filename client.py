@@ -1,19 +1,34 @@
 import asyncio
+import hashlib
 import os
 import json
 import time
 import traceback
+from collections import Counter
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from contextlib import AsyncExitStack
 import yaml
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
 from mcp.client.stdio import stdio_client
 from mcp import ClientSession, StdioServerParameters
 
+# Prefer the libyaml-backed loader (much faster); fall back to pure Python.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 load_dotenv(".env")
-with open("config/info.yaml", "r") as f:
-    info = yaml.safe_load(f)
+# Importing the precompiled module (scripts/compile_config.py) is much
+# faster than parsing YAML; fall back to the YAML file if it is absent.
+try:
+    from config.info import INFO as info
+except ImportError:
+    with open("config/info.yaml", "r") as f:
+        info = yaml.load(f, Loader=_YamlLoader)
 
 
 class LLMConfig:
@@ -49,14 +64,32 @@ class LLMConfig:
             raise RuntimeError(
                 f"Missing API key for provider={self.provider}. Check your environment.")
 
-    def make_client(self) -> OpenAI:
+    def make_client(self) -> AsyncOpenAI:
+        # Async client so LLM roundtrips don't block the event loop
         if self.base_url:
-            return OpenAI(api_key=self.api_key, base_url=self.base_url)
-        return OpenAI(api_key=self.api_key)
+            return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return AsyncOpenAI(api_key=self.api_key)
+
+
+# Tools the client drives explicitly; never offered to the LLM
+EXCLUDED_TOOL_NAMES = frozenset({"init_package_environment_tool"})
+
+# Default model per provider when none is configured explicitly
+DEFAULT_MODELS = {
+    "openai": "gpt-5",
+    "qwen": "qwen3-max",
+    "claude": "claude-sonnet-4-5-20250929",
+    "deepseek": "deepseek-v3",
+}
 
 
 def make_args_key(tool_name: str, tool_args: dict) -> str:
-    return f"{tool_name}::{json.dumps(tool_args, sort_keys=True, ensure_ascii=False, separators=(',', ':'))}"
+    # Hash the canonical encoding so keys stay short and cheap to compare
+    # even for tools whose arguments embed whole file contents.
+    payload = json.dumps(
+        tool_args, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    return f"{tool_name}::{hashlib.blake2b(payload, digest_size=16).hexdigest()}"
 
 
 class AutoRepairClient:
@@ -95,50 +128,153 @@ class AutoRepairClient:
         self.log_dir = info["paths"]["log_dir"]
         self.temp_work_dir = info["paths"]["temp_work_dir"]
 
-        os.makedirs(self.result_dir, exist_ok=True)
-        os.makedirs(self.temp_work_dir, exist_ok=True)
-        os.makedirs(self.log_dir, exist_ok=True)
+        for p in (self.result_dir, self.temp_work_dir, self.log_dir):
+            Path(p).mkdir(parents=True, exist_ok=True)
 
         self.server_script = server_script
         self.max_retries = max_retries
         self.max_build_attempts = max_build_attempts
         self.max_tool_rounds = max_tool_rounds
 
-        # Per-package state
-        self.upload_status: Dict[str, bool] = {}
+        # Per-package state, persisted so a killed run can warm-start
+        # instead of redoing work
+        self._state_path = os.path.join(self.result_dir, "state.json")
+        self.upload_status: Dict[str, bool] = self._load_state().get(
+            "upload_status", {}
+        )
+
+        # LLM response cache: exact-match on (model, messages, tools),
+        # in memory plus one JSON file per key under result_dir
+        self._llm_cache: Dict[str, ChatCompletion] = {}
+        self._llm_cache_dir = os.path.join(self.result_dir, "llm_cache")
+        os.makedirs(self._llm_cache_dir, exist_ok=True)
+
+        # Background log writer (created lazily once a loop is running)
+        self._log_q: Optional[asyncio.Queue] = None
+        self._log_task: Optional[asyncio.Task] = None
+        self._log_paths: Dict[str, str] = {}
+
+        # Tool schema caches (populated once per connection)
+        self._tools_cache: Optional[List[Dict]] = None
+        self._tools_cache_filtered: Optional[List[Dict]] = None
+
+        # Bound how many packages are processed concurrently
+        self._pkg_sem = asyncio.Semaphore(info.get("max_parallel_packages", 4))
+
+        # Read the system prompt template once; process_one_package reuses it
+        # for every package instead of reopening the file each time.
+        with open("prompts/full_file_generation.txt", "r", encoding="utf-8") as f:
+            self._system_prompt_tpl = f.read()
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        try:
+            with open(self._state_path, "w", encoding="utf-8") as f:
+                json.dump({"upload_status": self.upload_status}, f)
+        except OSError:
+            pass  # persistence is best-effort
+
+    def _log_path(self, tag: str) -> str:
+        # Memoized per tag; also what keys the writer's open-handle reuse
+        path = self._log_paths.get(tag)
+        if path is None:
+            path = os.path.join(self.log_dir, f"{tag}.log")
+            self._log_paths[tag] = path
+        return path
 
     def _log(self, tag: str, msg: str):
         ts = time.strftime("%Y-%m-%d %H:%M:%S")
-        path = os.path.join(self.log_dir, f"{tag}.log")
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(f"[{ts}] {msg}\n")
         print(msg)
-
-    async def connect(self, attempt: int = 1) -> bool:
-        self._log("global", f"Connecting to MCP server... (attempt {attempt})")
+        if self._log_task is None or self._log_task.done():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # No running loop (e.g. called from sync context): write directly
+                with open(self._log_path(tag), "a", encoding="utf-8") as f:
+                    f.write(f"[{ts}] {msg}\n")
+                return
+            self._log_q = asyncio.Queue()
+            self._log_task = asyncio.create_task(self._log_writer())
+        self._log_q.put_nowait((tag, ts, msg))
+
+    async def _log_writer(self):
+        """
+        Single background task that drains the log queue in batches, keeping
+        one open handle per tag so hot loops don't pay an open/close per line.
+        """
+        handles: Dict[str, object] = {}
         try:
-            params = StdioServerParameters(
-                command="uv", args=["run", self.server_script]
-            )
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(params)
-            )
-            stdio, write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(
-                ClientSession(stdio, write)
-            )
-            await self.session.initialize()
+            while True:
+                batch = [await self._log_q.get()]
+                while not self._log_q.empty():
+                    batch.append(self._log_q.get_nowait())
+                touched = set()
+                for tag, ts, msg in batch:
+                    fh = handles.get(tag)
+                    if fh is None:
+                        fh = open(self._log_path(tag), "a", encoding="utf-8")
+                        handles[tag] = fh
+                    fh.write(f"[{ts}] {msg}\n")
+                    touched.add(tag)
+                for tag in touched:
+                    handles[tag].flush()
+                for _ in batch:
+                    self._log_q.task_done()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for fh in handles.values():
+                fh.close()
+
+    async def connect(self) -> bool:
+        for attempt in range(1, self.max_retries + 1):
+            self._log("global", f"Connecting to MCP server... (attempt {attempt})")
+            # Fresh stack per attempt so a failed transport is released
+            # right away instead of accumulating on the shared stack
+            stack = AsyncExitStack()
+            try:
+                params = StdioServerParameters(
+                    command="uv", args=["run", self.server_script]
+                )
+                stdio_transport = await stack.enter_async_context(
+                    stdio_client(params)
+                )
+                stdio, write = stdio_transport
+                session = await stack.enter_async_context(
+                    ClientSession(stdio, write)
+                )
+                await session.initialize()
+            except Exception as e:
+                self._log("global", f"Connect failed: {e}")
+                try:
+                    await stack.aclose()
+                except Exception:
+                    pass
+                if attempt < self.max_retries:
+                    await asyncio.sleep(3)
+                continue
+
+            self.exit_stack = stack
+            self.session = session
             self.is_session_active = True
+            # Tool schemas may differ on a new connection
+            self._tools_cache = None
+            self._tools_cache_filtered = None
             self._log("global", "Connected to MCP server.")
             return True
-        except Exception as e:
-            self._log("global", f"Connect failed: {e}")
-            if attempt < self.max_retries:
-                await asyncio.sleep(3)
-                return await self.connect(attempt + 1)
-            return False
+        return False
 
     async def list_tools_openai_format(self) -> List[Dict]:
+        # The tool set only changes across connections, so build the schema
+        # list (and its filtered variant) once and reuse it per package.
+        if self._tools_cache is not None:
+            return self._tools_cache
         assert self.session is not None
         resp = await self.session.list_tools()
         tools = [
@@ -153,6 +289,12 @@ class AutoRepairClient:
             }
             for t in resp.tools
         ]
+        self._tools_cache = tools
+        self._tools_cache_filtered = [
+            t
+            for t in tools
+            if t.get("function", {}).get("name") not in EXCLUDED_TOOL_NAMES
+        ]
         return tools
 
     async def process_all_packages(self):
@@ -161,10 +303,14 @@ class AutoRepairClient:
             return
 
         assert self.session is not None
-        # Query server for packages to process
-        pkg_resp = await self.session.call_tool(
-            "get_packages_to_process",
-            {"base_dir": self.base_dir, "result_dir": self.result_dir},
+        # Query packages and the tool list concurrently; they are independent
+        # and this saves one MCP roundtrip of latency before work starts
+        pkg_resp, _ = await asyncio.gather(
+            self.session.call_tool(
+                "get_packages_to_process",
+                {"base_dir": self.base_dir, "result_dir": self.result_dir},
+            ),
+            self.list_tools_openai_format(),
         )
         pkg_info = json.loads(pkg_resp.content[0].text)
         if not pkg_info.get("success"):
@@ -174,16 +320,23 @@ class AutoRepairClient:
         packages = pkg_info.get("packages", [])
         self._log("global", f"Found {len(packages)} packages.")
 
-        tools = await self.list_tools_openai_format()
         # Prevent LLM from re-invoking init tool (we invoke it explicitly below)
-        tools = [
-            t
-            for t in tools
-            if t.get("function", {}).get("name") != "init_package_environment_tool"
-        ]
+        tools = self._tools_cache_filtered
+
+        # Packages are independent and I/O-bound (LLM/tool roundtrips), so
+        # process them concurrently, bounded by the semaphore.
+        await asyncio.gather(
+            *[
+                self._guarded_process(pkg, idx, len(packages), tools)
+                for idx, pkg in enumerate(packages, 1)
+            ]
+        )
 
-        for idx, pkg in enumerate(packages, 1):
-            self._log("global", f"\n=== [{idx}/{len(packages)}] {pkg} ===")
+    async def _guarded_process(
+        self, pkg: str, idx: int, total: int, tools: List[Dict]
+    ):
+        async with self._pkg_sem:
+            self._log("global", f"\n=== [{idx}/{total}] {pkg} ===")
             try:
                 await self.process_one_package(pkg, tools)
             except Exception as e:
@@ -192,8 +345,23 @@ class AutoRepairClient:
     async def process_one_package(self, package_name: str, tools: List[Dict]):
         assert self.session is not None
 
+        # Skip packages already built successfully in a previous run
+        prior_result = os.path.join(self.result_dir, f"{package_name}_result.txt")
+        if os.path.exists(prior_result):
+            try:
+                with open(prior_result, "r", encoding="utf-8") as f:
+                    if f.read(32).startswith("Build succeeded"):
+                        self._log(
+                            package_name,
+                            "Already succeeded in a previous run; skipping.",
+                        )
+                        return
+            except OSError:
+                pass
+
         # Reset upload status for hard dependency enforcement
         self.upload_status[package_name] = False
+        self._save_state()
 
         # Initialize temp env (copy package -> temp dir)
         init_ret = await self.session.call_tool(
@@ -213,9 +381,8 @@ class AutoRepairClient:
         package_path = init_data["package_path"]
         result_file = init_data["result_file"]
 
-        # Load system prompt template
-        with open("prompts/full_file_generation.txt", "r", encoding="utf-8") as f:
-            system_prompt_tpl = f.read()
+        # System prompt template (loaded once in __init__)
+        system_prompt_tpl = self._system_prompt_tpl
 
         build_succeeded = False
         final_text = ""
@@ -226,12 +393,13 @@ class AutoRepairClient:
                 package_name,
                 f"--- Build attempt {attempt}/{self.max_build_attempts} ---",
             )
-            try:
-                await self.session.call_tool(
+            # Cache clear overlaps with building the prompt; both are awaited
+            # before the LLM loop starts
+            reset_task = asyncio.create_task(
+                self.session.call_tool(
                     "reset_package_cache_tool", {"package_name": package_name}
                 )
-            except Exception as e:
-                self._log(package_name, f"Cache clear failed on attempt {attempt}: {e}")
+            )
 
             upd = await self.session.call_tool(
                 "update_prompt_with_history_tool",
@@ -248,12 +416,17 @@ class AutoRepairClient:
             )
             messages = json.loads(upd.content[0].text)["messages"]
 
+            try:
+                await reset_task
+            except Exception as e:
+                self._log(package_name, f"Cache clear failed on attempt {attempt}: {e}")
+
             # Ensure the first message is a system message for OpenAI-chat format
             if messages and messages[0].get("role") != "system":
                 messages.insert(0, {"role": "system", "content": system_prompt_tpl})
 
             content, ok = await self._llm_tools_loop(
-                package_name, package_path, messages, tools
+                package_name, package_path, messages, tools, attempt
             )
             if ok:
                 build_succeeded = True
@@ -274,26 +447,231 @@ class AutoRepairClient:
         if not build_succeeded:
             self._log(package_name, "Max attempts reached without success.")
 
+    def _completion_cache_key(self, messages: List[Dict], tools: List[Dict]) -> str:
+        payload = json.dumps(
+            {"m": self.llm_cfg.model, "msgs": messages, "tools": tools},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _cached_completion(
+        self,
+        messages: List[Dict],
+        tools: List[Dict],
+        prompt_cache_key: Optional[str] = None,
+    ) -> ChatCompletion:
+        """
+        chat.completions.create with an exact-match cache. Repeated failure
+        patterns across packages/attempts re-send near-identical prompts, so
+        hits skip the whole LLM roundtrip (and its cost). The cache persists
+        under result_dir so reruns warm-start.
+        """
+        key = self._completion_cache_key(messages, tools)
+        resp = self._llm_cache.get(key)
+        if resp is not None:
+            return resp
+
+        cache_path = os.path.join(self._llm_cache_dir, f"{key}.json")
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    resp = ChatCompletion.model_validate_json(f.read())
+                self._llm_cache[key] = resp
+                return resp
+            except Exception:
+                pass  # corrupt cache entry; fall through to a fresh call
+
+        # Stream the completion so the event loop stays responsive while
+        # tokens are generated, then fold the deltas back into one object.
+        # prompt_cache_key lets the provider reuse the static prefix (system
+        # prompt + tool schemas) at cached-input rates across rounds.
+        extra_body = {"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {}
+        stream = await self.client.chat.completions.create(
+            model=self.llm_cfg.model,
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+            stream=True,
+            extra_body=extra_body,
+        )
+        resp = await self._collect_stream(stream)
+        self._llm_cache[key] = resp
+        try:
+            with open(cache_path, "w", encoding="utf-8") as f:
+                f.write(resp.model_dump_json())
+        except Exception:
+            pass  # cache write failures are non-fatal
+        return resp
+
+    @staticmethod
+    async def _collect_stream(stream) -> ChatCompletion:
+        """
+        Accumulate a streamed chat completion into a regular ChatCompletion:
+        concatenate content deltas and merge tool-call fragments by index.
+        """
+        last_chunk = None
+        role = "assistant"
+        content_parts: List[str] = []
+        tool_calls: Dict[int, Dict] = {}
+        finish_reason = None
+
+        async for chunk in stream:
+            last_chunk = chunk
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason is not None:
+                finish_reason = choice.finish_reason
+            delta = choice.delta
+            if delta is None:
+                continue
+            if delta.role:
+                role = delta.role
+            if delta.content:
+                content_parts.append(delta.content)
+            for tc in delta.tool_calls or []:
+                slot = tool_calls.setdefault(
+                    tc.index,
+                    {
+                        "id": tc.id or "",
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""},
+                    },
+                )
+                if tc.id:
+                    slot["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        slot["function"]["name"] = tc.function.name
+                    if tc.function.arguments:
+                        slot["function"]["arguments"] += tc.function.arguments
+
+        message: Dict = {"role": role, "content": "".join(content_parts) or None}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+
+        return ChatCompletion.model_validate(
+            {
+                "id": last_chunk.id if last_chunk else "stream",
+                "object": "chat.completion",
+                "created": last_chunk.created if last_chunk else int(time.time()),
+                "model": last_chunk.model if last_chunk else "",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": finish_reason or "stop",
+                    }
+                ],
+            }
+        )
+
+    async def _handle_one_tool_call(
+        self, package_name: str, tc
+    ) -> Tuple[str, Optional[str], str]:
+        """
+        Run the repeat guard, cache lookup, and actual tool invocation for a
+        single tool call. Returns (tool_ret, nudge, args_key) where nudge is
+        an extra user message to append when the call was blocked as a repeat.
+        """
+        assert self.session is not None
+        tool_name = tc.function.name
+        try:
+            tool_args = json.loads(tc.function.arguments or "{}")
+        except json.JSONDecodeError:
+            tool_args = {}
+        self._log(
+            package_name,
+            f"Tool call: {tool_name}({json.dumps(tool_args, ensure_ascii=False)[:500]})",
+        )
+
+        # Repeat guard + cache lookup + history record in one roundtrip
+        args_key = make_args_key(tool_name, tool_args)
+        prep = await self.session.call_tool(
+            "prepare_tool_call",
+            {
+                "tool_name": tool_name,
+                "args_key": args_key,
+                "package_name": package_name,
+                "max_repeat": 3,
+            },
+        )
+        prep_data = json.loads(prep.content[0].text)
+
+        if not prep_data.get("allowed", True):
+            # Block and nudge
+            tool_ret = prep_data.get("message", "repeated call blocked")
+            nudge = (
+                f"Do not call {tool_name} again in this attempt. "
+                "Continue with code changes or other tools."
+            )
+            return tool_ret, nudge, args_key
+
+        if prep_data.get("hit"):
+            tool_ret = prep_data["result"]
+        else:
+            try:
+                res = await asyncio.wait_for(
+                    self.session.call_tool(tool_name, tool_args),
+                    timeout=600,
+                )
+                tool_ret = res.content[0].text
+                self._log(package_name, f"Tool return text: {tool_ret[:1000]}")
+                # Cache only for safe/beneficial tools (example from original)
+                if (
+                    tool_name in ["modify_file_tool"]
+                    and "error" not in tool_ret.lower()
+                ):
+                    await self.session.call_tool(
+                        "finalize_tool_call",
+                        {
+                            "call_key": args_key,
+                            "result": tool_ret,
+                            "package_name": package_name,
+                        },
+                    )
+            except asyncio.TimeoutError:
+                tool_ret = f"Error: Tool {tool_name} timed out"
+            except Exception as e:
+                tool_ret = f"Error: Tool {tool_name} failed: {e}"
+
+        if tool_name in [
+            "upload_file_to_obs_tool",
+            "upload_file_to_obs_tool_deepseek",
+        ]:
+            if "successful" in tool_ret.lower() or "success" in tool_ret.lower():
+                self.upload_status[package_name] = True
+                self._save_state()
+                self._log(package_name, "✓ Upload marked as successful")
+
+        return tool_ret, None, args_key
+
     async def _llm_tools_loop(
         self,
         package_name: str,
         package_path: str,
         messages: List[Dict],
         tools: List[Dict],
+        attempt: int = 0,
     ) -> Tuple[str, bool]:
         choice = None
         latest_text = ""
         rounds = 0
         did_upload = False
+        # Stable per-attempt key so the provider's prefix cache hits across
+        # the rounds of this attempt (messages only grow at the tail)
+        prompt_cache_key = f"{package_name}:{attempt}"
+        # Loop detection: abort doomed attempts instead of burning tokens on
+        # the same failing call over and over
+        call_counts: Counter = Counter()
+        recent_rets: List[str] = []
+        abort_reason: Optional[str] = None
 
         # Initial model step
         try:
-            resp = self.client.chat.completions.create(
-                model=self.llm_cfg.model,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-            )
+            resp = await self._cached_completion(messages, tools, prompt_cache_key)
             choice = resp.choices[0]
             latest_text = choice.message.content or ""
         except Exception as e:
@@ -307,157 +685,108 @@ class AutoRepairClient:
             rounds += 1
             self._log(package_name, f"== Tool round {rounds} ==")
 
-            for tc in choice.message.tool_calls or []:
-                tool_name = tc.function.name
-                try:
-                    tool_args = json.loads(tc.function.arguments or "{}")
-                except json.JSONDecodeError:
-                    tool_args = {}
-                self._log(
-                    package_name,
-                    f"Tool call: {tool_name}({json.dumps(tool_args, ensure_ascii=False)[:500]})",
-                )
-
-                # Repeat guard
-                args_key = make_args_key(tool_name, tool_args)
-                repeat_check = await self.session.call_tool(
-                    "check_repeat_tool_call",
+            tool_calls = choice.message.tool_calls or []
+            # check_build_result depends on upload_status set by sibling
+            # upload calls, so it stays on a serial path after the others.
+            independent = [
+                tc for tc in tool_calls if tc.function.name != "check_build_result"
+            ]
+            build_checks = [
+                tc for tc in tool_calls if tc.function.name == "check_build_result"
+            ]
+
+            # Append the assistant turn once; each tool result references it
+            # by tool_call_id. Re-appending it per tool call duplicated it
+            # N-1 times and inflated every subsequent prompt.
+            if tool_calls:
+                messages.append(
                     {
-                        "tool_name": tool_name,
-                        "args_key": args_key,
-                        "max_repeat": 3,
-                        "package_name": package_name,
-                    },
+                        "role": "assistant",
+                        "content": choice.message.content,
+                        "tool_calls": [t.model_dump() for t in tool_calls],
+                    }
                 )
-                repeat_allowed = json.loads(repeat_check.content[0].text).get(
-                    "allowed", True
+
+            # Dispatch independent tool calls concurrently
+            results = await asyncio.gather(
+                *[self._handle_one_tool_call(package_name, tc) for tc in independent]
+            )
+
+            nudges = []
+            for tc, (tool_ret, nudge, args_key) in zip(independent, results):
+                call_counts[args_key] += 1
+                if call_counts[args_key] > 3:
+                    abort_reason = f"{tc.function.name} retried more than 3 times"
+                recent_rets.append(tool_ret)
+                if nudge:
+                    nudges.append(nudge)
+                # Feed back results to the model
+                messages.append(
+                    {"role": "tool", "tool_call_id": tc.id, "content": tool_ret}
                 )
 
-                # Enforce upload-before-check rule (from client_claude)
-                if tool_name == "check_build_result" and not self.upload_status.get(
-                    package_name, False
-                ):
+            did_upload = did_upload or self.upload_status.get(package_name, False)
+
+            for tc in build_checks:
+                # Enforce upload-before-check rule (from client_claude).
+                # Checked before any bookkeeping RPC: a blocked call pays no
+                # prepare_tool_call or parse_build_result_tool roundtrip.
+                if not self.upload_status.get(package_name, False):
                     tool_ret = (
                         "ERROR: Cannot call check_build_result before uploading. "
                         "You must call upload_file_to_obs_tool first."
                     )
                     # Feed back the error as tool result
-                    messages.append(
-                        {
-                            "role": "assistant",
-                            "content": choice.message.content,
-                            "tool_calls": [
-                                t.model_dump()
-                                for t in (choice.message.tool_calls or [])
-                            ],
-                        }
-                    )
                     messages.append(
                         {"role": "tool", "tool_call_id": tc.id, "content": tool_ret}
                     )
                     continue
 
-                if not repeat_allowed:
-                    # Block and nudge
-                    tool_ret = json.loads(repeat_check.content[0].text).get(
-                        "message", "repeated call blocked"
-                    )
-                    messages.append(
-                        {
-                            "role": "user",
-                            "content": f"Do not call {tool_name} again in this attempt. Continue with code changes or other tools.",
-                        }
-                    )
-                else:
-                    # Cache lookup
-                    cache = await self.session.call_tool(
-                        "check_tool_cache",
-                        {
-                            "call_key": args_key,
-                            "tool_name": tool_name,
-                            "package_name": package_name,
-                        },
-                    )
-                    cache_data = json.loads(cache.content[0].text)
-                    if cache_data.get("hit"):
-                        tool_ret = cache_data["result"]
-                    else:
-                        try:
-                            res = await asyncio.wait_for(
-                                self.session.call_tool(tool_name, tool_args),
-                                timeout=600,
-                            )
-                            tool_ret = res.content[0].text
-                            self._log(
-                                package_name, f"Tool return text: {tool_ret[:1000]}"
-                            )
-                            # Cache only for safe/beneficial tools (example from original)
-                            if (
-                                tool_name in ["modify_file_tool"]
-                                and "error" not in tool_ret.lower()
-                            ):
-                                await self.session.call_tool(
-                                    "cache_tool_result",
-                                    {
-                                        "call_key": args_key,
-                                        "result": tool_ret,
-                                        "package_name": package_name,
-                                    },
-                                )
-                        except asyncio.TimeoutError:
-                            tool_ret = f"Error: Tool {tool_name} timed out"
-                        except Exception as e:
-                            tool_ret = f"Error: Tool {tool_name} failed: {e}"
-
-                    # Record history of tool calls regardless of cache
-                    await self.session.call_tool(
-                        "record_tool_call_history",
-                        {"call_key": args_key, "package_name": package_name},
-                    )
-
-                if tool_name in [
-                    "upload_file_to_obs_tool",
-                    "upload_file_to_obs_tool_deepseek",
-                ]:
-                    if (
-                        "successful" in tool_ret.lower()
-                        or "success" in tool_ret.lower()
-                    ):
-                        self.upload_status[package_name] = True
-                        did_upload = True
-                        self._log(package_name, "✓ Upload marked as successful")
-
-                # Feed back results to the model
-                messages.append(
-                    {
-                        "role": "assistant",
-                        "content": choice.message.content,
-                        "tool_calls": [
-                            t.model_dump() for t in (choice.message.tool_calls or [])
-                        ],
-                    }
+                tool_ret, nudge, args_key = await self._handle_one_tool_call(
+                    package_name, tc
                 )
+                call_counts[args_key] += 1
+                if call_counts[args_key] > 3:
+                    abort_reason = f"{tc.function.name} retried more than 3 times"
+                recent_rets.append(tool_ret)
+                if nudge:
+                    nudges.append(nudge)
                 messages.append(
                     {"role": "tool", "tool_call_id": tc.id, "content": tool_ret}
                 )
 
-                # If it's a build verification, parse immediately
-                if tool_name == "check_build_result":
-                    parsed = await self.session.call_tool(
-                        "parse_build_result_tool",
-                        {"result_content": tool_ret, "package_name": package_name},
-                    )
-                    if json.loads(parsed.content[0].text).get("success"):
-                        return latest_text, True
+                # Parse the build verification immediately
+                parsed = await self.session.call_tool(
+                    "parse_build_result_tool",
+                    {"result_content": tool_ret, "package_name": package_name},
+                )
+                if json.loads(parsed.content[0].text).get("success"):
+                    return latest_text, True
+
+            # Nudges go after the tool results so every tool_call_id in the
+            # assistant turn is answered first
+            for nudge in nudges:
+                messages.append({"role": "user", "content": nudge})
+
+            # Abort on repeated-failure patterns: same call >3 times, or the
+            # last 3 tool returns all errors
+            last3 = [r.lower() for r in recent_rets[-3:]]
+            if len(last3) == 3 and all(
+                "error" in r or "failed" in r for r in last3
+            ):
+                abort_reason = "last 3 tool calls all returned errors"
+            if abort_reason:
+                self._log(
+                    package_name, f"Aborting attempt early: {abort_reason}"
+                )
+                latest_text = (
+                    f"Aborted: repeated failure pattern detected ({abort_reason})."
+                )
+                break
 
             # next model step
             try:
-                resp = self.client.chat.completions.create(
-                    model=self.llm_cfg.model,
-                    messages=messages,
-                    tools=tools,
-                    tool_choice="auto",
-                )
+                resp = await self._cached_completion(messages, tools, prompt_cache_key)
                 choice = resp.choices[0]
                 latest_text = choice.message.content or latest_text
             except Exception as e:
@@ -495,17 +824,25 @@ class AutoRepairClient:
         self.is_session_active = False
         self.session = None
         self._log("global", "Cleanup completed.")
+        # Flush pending log lines and stop the writer
+        if self._log_task is not None and not self._log_task.done():
+            await self._log_q.join()
+            self._log_task.cancel()
+            try:
+                await self._log_task
+            except asyncio.CancelledError:
+                pass
 
 
 async def main():
     # Choose provider + model here.
     provider = info["LLM_PROVIDER"].lower()
-    default_model = {
-        "openai": "gpt-5",
-        "qwen": "qwen3-max",
-        "claude": "claude-sonnet-4-5-20250929",
-        "deepseek": "deepseek-v3",
-    }.get(provider)
+    default_model = DEFAULT_MODELS.get(provider)
+    if default_model is None:
+        raise RuntimeError(
+            f"Unknown LLM_PROVIDER '{provider}'. "
+            f"Expected one of: {', '.join(sorted(DEFAULT_MODELS))}."
+        )
 
     llm_cfg = LLMConfig(provider=provider, model=default_model)
     cli = AutoRepairClient(llm=llm_cfg)
@@ -516,4 +853,12 @@ async def main():
 
 
 if __name__ == "__main__":
+    # uvloop is a drop-in faster event loop on POSIX; the workload is pure
+    # I/O (MCP pipes + HTTPS), so it compounds with the async changes.
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
@@ -11,9 +11,15 @@ from openai import OpenAI
 from mcp.client.stdio import stdio_client
 from mcp import ClientSession, StdioServerParameters
 
+# Prefer the libyaml-backed loader (much faster); fall back to pure Python.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 load_dotenv(".env")
 with open("config/info.yaml", "r") as f:
-    info = yaml.safe_load(f)
+    info = yaml.load(f, Loader=_YamlLoader)
 
 
 class LLMConfig:
@@ -335,7 +341,8 @@ class AutoRepairClientPatch:
                         "package_name": package_name,
                     },
                 )
-                repeat_allowed = json.loads(repeat_check.content[0].text).get("allowed", True)
+                rc_data = json.loads(repeat_check.content[0].text)
+                repeat_allowed = rc_data.get("allowed", True)
 
                 if tool_name == "check_build_result" and not self.upload_status.get(package_name, False):
                     tool_ret = (
@@ -355,9 +362,7 @@ class AutoRepairClientPatch:
 
                 if not repeat_allowed:
                     # Block and nudge
-                    tool_ret = json.loads(repeat_check.content[0].text).get(
-                        "message", "repeated call blocked"
-                    )
+                    tool_ret = rc_data.get("message", "repeated call blocked")
                     messages.append(
                         {
                             "role": "user",
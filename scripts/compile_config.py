@@ -0,0 +1,39 @@
+"""Precompile config/info.yaml into an importable Python module.
+
+Parsing YAML on every startup is slow compared to importing a compiled
+.py module, so this script bakes the config into `config/info.py` as a
+plain dict literal. The clients import `INFO` from that module when it
+exists and fall back to parsing the YAML otherwise, so running this
+script is optional. Re-run it whenever config/info.yaml changes:
+
+    python scripts/compile_config.py
+"""
+
+import os
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YAML_PATH = os.path.join(REPO_ROOT, "config", "info.yaml")
+MODULE_PATH = os.path.join(REPO_ROOT, "config", "info.py")
+
+
+def main():
+    with open(YAML_PATH, "r") as f:
+        info = yaml.load(f, Loader=_YamlLoader)
+
+    with open(MODULE_PATH, "w", encoding="utf-8") as f:
+        f.write("# Auto-generated by scripts/compile_config.py -- do not edit.\n")
+        f.write("# Source of truth is config/info.yaml.\n")
+        f.write(f"INFO = {info!r}\n")
+
+    print(f"Wrote {MODULE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,224 @@
+import concurrent.futures
 import os
+from collections import Counter, deque
 import json
+import queue
+import re
 import shutil
 import difflib
+import threading
 import time
 from mcp.server.fastmcp import FastMCP
 from datetime import datetime
 from tools.auto_repair.get_repo_structure import get_project_structure_from_local
 from tools.auto_repair.check_build_res import check_main
 from tools.auto_repair.upload_files import main_upload
+import gzip
+import hashlib
+import mmap
+import sqlite3
+import subprocess
 import tarfile
 import zipfile
 
+try:
+    import fcntl
+except ImportError:  # non-POSIX
+    fcntl = None
+
 mcp = FastMCP("auto_repair_server")
 
 # Server-side state storage
 server_state = {
-    "modification_history": {},  # {package_name: [{file_path, diff, timestamp}, ...]}
-    "tool_call_history": {},  # {package_name: [(tool_name, args_key), ...]}
+    "modification_history": {},  # {package_name: deque({file_path, diff, seq, ...})}
+    "tool_call_history": {},  # {package_name: Counter({call_key: count})}
     "tool_cache": {},  # {package_name: {call_key: result, ...}}
+    "package_dirs": {},  # {package_name: temp sandbox dir}
+    "prompt_cache": {},  # {package_name: (rendered_mod_count, rendered_history)}
 }
 
+def _jd(obj) -> str:
+    """Compact JSON for tool return values: no spaces, no ASCII escaping."""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+# Diff-log writes happen off the tool critical path: tools enqueue one
+# pre-joined payload per call and a daemon thread appends it to the log.
+_log_queue: "queue.Queue[tuple]" = queue.Queue()
+
+
+def _log_writer_loop():
+    while True:
+        path, payload = _log_queue.get()
+        try:
+            with open(path, "a", encoding="utf-8") as log:
+                log.write(payload)
+        except OSError:
+            pass  # logging is best-effort
+        finally:
+            _log_queue.task_done()
+
+
+_log_writer = threading.Thread(target=_log_writer_loop, daemon=True)
+_log_writer.start()
+
+# On-disk tool cache: survives server restarts and deduplicates identical
+# calls across runs. Entries are keyed on the call plus a hash of the
+# package sandbox state; the hash is memoized and writers invalidate it, so
+# the stat-walk runs once per mutation rather than once per tool call.
+_DISK_CACHE_PATH = os.path.join("data", ".tool_cache.sqlite")
+_disk_cache_conn = None
+
+
+def _disk_cache() -> sqlite3.Connection:
+    global _disk_cache_conn
+    if _disk_cache_conn is None:
+        os.makedirs(os.path.dirname(_DISK_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(_DISK_CACHE_PATH)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache"
+            " (key TEXT PRIMARY KEY, result TEXT, package TEXT)"
+        )
+        try:
+            conn.execute("ALTER TABLE tool_cache ADD COLUMN package TEXT")
+        except sqlite3.Error:
+            pass  # pre-existing table already has the column
+        _disk_cache_conn = conn
+    return _disk_cache_conn
+
+
+# {package_name: digest} — cleared by _invalidate_sandbox_hash on writes
+_sandbox_hash_cache = {}
+# {package_name: digest captured at cache-lookup time} — puts key on the
+# state the tool saw *before* it ran, so a fresh run over the same sources
+# reproduces the key and gets the warm hit
+_prewrite_hashes = {}
+
+
+def _sandbox_hash(package_name: str) -> str:
+    """
+    Aggregated path+size+mtime hash of the package's temp sandbox. Memoized;
+    every tool that writes into the sandbox calls _invalidate_sandbox_hash.
+    """
+    cached = _sandbox_hash_cache.get(package_name)
+    if cached is not None:
+        return cached
+    package_dir = server_state["package_dirs"].get(package_name)
+    if not package_dir or not os.path.isdir(package_dir):
+        return ""
+    h = hashlib.blake2b(digest_size=16)
+
+    def _walk(directory):
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue  # vanished between scandir and stat
+                h.update(entry.path.encode())
+                h.update(str(st.st_size).encode())
+                h.update(str(st.st_mtime_ns).encode())
+                if entry.is_dir(follow_symlinks=False):
+                    _walk(entry.path)
+
+    _walk(package_dir)
+    digest = h.hexdigest()
+    _sandbox_hash_cache[package_name] = digest
+    return digest
+
+
+def _invalidate_sandbox_hash(package_name: str) -> None:
+    _sandbox_hash_cache.pop(package_name, None)
+
+
+def _persistent_key(call_key: str, sandbox_hash: str) -> str:
+    payload = f"{call_key}\x1f{sandbox_hash}"
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _disk_cache_get(call_key: str, package_name: str):
+    sandbox_hash = _sandbox_hash(package_name)
+    # Remember the state this lookup saw so the matching put keys on it
+    _prewrite_hashes[package_name] = sandbox_hash
+    try:
+        row = _disk_cache().execute(
+            "SELECT result FROM tool_cache WHERE key = ?",
+            (_persistent_key(call_key, sandbox_hash),),
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def _disk_cache_put(call_key: str, result: str, package_name: str):
+    # Key on the pre-write state captured at lookup time: keying on the
+    # post-write mtimes would make the entry unreachable for any later run
+    sandbox_hash = _prewrite_hashes.pop(package_name, None)
+    if sandbox_hash is None:
+        sandbox_hash = _sandbox_hash(package_name)
+    try:
+        conn = _disk_cache()
+        conn.execute(
+            "INSERT OR REPLACE INTO tool_cache (key, result, package) VALUES (?, ?, ?)",
+            (_persistent_key(call_key, sandbox_hash), result, package_name),
+        )
+        conn.commit()
+    except sqlite3.Error:
+        pass  # persistence is best-effort
+
+
+# FICLONE ioctl: ask the filesystem for a copy-on-write clone
+_FICLONE = 0x40049409
+
+
+def _clone_copy(src, dst, *, follow_symlinks=True):
+    """
+    Copy a file with the cheapest mechanism the kernel offers: a reflink
+    clone (O(1) in file size on Btrfs/XFS), then copy_file_range (in-kernel
+    byte transfer, no userspace round-trip), then plain shutil.copy2.
+    """
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                    shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+                    return dst
+                except OSError:
+                    pass
+            if hasattr(os, "copy_file_range"):
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = 0
+                while copied < size:
+                    n = os.copy_file_range(
+                        fsrc.fileno(), fdst.fileno(), size - copied
+                    )
+                    if n == 0:
+                        break
+                    copied += n
+                if copied >= size:
+                    shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+                    return dst
+    except OSError:
+        pass
+    return shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+
+
+class _MultithreadedCopier(concurrent.futures.ThreadPoolExecutor):
+    """
+    copy_function adapter for shutil.copytree that fans file copies out to a
+    thread pool. The copies release the GIL in their syscalls, so many small
+    files copy with overlapped open/stat/creat latency instead of serially.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+
+    def copy(self, src, dst, *, follow_symlinks=True):
+        self.futures.append(self.submit(_clone_copy, src, dst))
+
 
 @mcp.tool()
 def init_package_environment_tool(
@@ -42,25 +241,32 @@ def init_package_environment_tool(
 
         original_package_path = os.path.join(base_dir, package_name)
         if not os.path.exists(original_package_path):
-            return json.dumps(
+            return _jd(
                 {
                     "success": False,
                     "message": f"Original package path not found: {original_package_path}",
                 }
             )
 
-        # Copy the file to a temporary directory
-        for item in os.listdir(original_package_path):
-            src = os.path.join(original_package_path, item)
-            dst = os.path.join(package_temp_dir, item)
-            if os.path.isdir(src):
-                shutil.copytree(src, dst, dirs_exist_ok=True)
-            else:
-                shutil.copy2(src, dst)
+        # Copy the files to a temporary directory, overlapping the per-file
+        # syscall latency across threads
+        with _MultithreadedCopier(
+            max_workers=min(32, (os.cpu_count() or 4) * 4)
+        ) as copier:
+            shutil.copytree(
+                original_package_path,
+                package_temp_dir,
+                copy_function=copier.copy,
+                dirs_exist_ok=True,
+            )
+        for fut in copier.futures:
+            fut.result()  # surface any copy error
 
         result_file = os.path.join(result_dir, f"{package_name}_result.txt")
+        server_state["package_dirs"][package_name] = package_temp_dir
+        _invalidate_sandbox_hash(package_name)
 
-        return json.dumps(
+        return _jd(
             {
                 "success": True,
                 "package_temp_dir": package_temp_dir,
@@ -70,11 +276,120 @@ def init_package_environment_tool(
             }
         )
     except Exception as e:
-        return json.dumps(
+        return _jd(
             {"success": False, "message": f"Initialization failed: {str(e)}"}
         )
 
 
+def _structured_line_diff(
+    old_content: str, new_content: str, include_context: bool = True
+) -> list:
+    """
+    Build the structured add/delete/keep diff used by the modification
+    history. Lines are interned to small ints first so the matcher compares
+    integers instead of strings, which is far faster than formatting a
+    unified diff and re-parsing its text — especially on large files.
+    With include_context=False the "keep" records are skipped entirely.
+    """
+    old_lines = old_content.splitlines()
+    new_lines = new_content.splitlines()
+
+    table: dict = {}
+
+    def _tokens(lines):
+        return [table.setdefault(line, len(table)) for line in lines]
+
+    matcher = difflib.SequenceMatcher(
+        a=_tokens(old_lines), b=_tokens(new_lines), autojunk=False
+    )
+
+    diff = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            if not include_context:
+                continue
+            # Keep only up to 3 context lines on each side of a change
+            span = range(j1, j2)
+            if len(span) > 6:
+                span = list(range(j1, j1 + 3)) + list(range(j2 - 3, j2))
+            for k in span:
+                diff.append(
+                    {
+                        "operation": "keep",
+                        "line_number": k + 1,
+                        "content": new_lines[k],
+                    }
+                )
+            continue
+        if tag in ("replace", "delete"):
+            for k in range(i1, i2):
+                diff.append(
+                    {
+                        "operation": "delete",
+                        "line_number": k + 1,
+                        "content": old_lines[k],
+                    }
+                )
+        if tag in ("replace", "insert"):
+            for k in range(j1, j2):
+                diff.append(
+                    {
+                        "operation": "add",
+                        "line_number": k + 1,
+                        "content": new_lines[k],
+                    }
+                )
+    return diff
+
+
+def _format_hunk_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _unified_diff_fast(old_lines, new_lines, fromfile="", tofile=""):
+    """
+    Unified-diff text built over interned line tokens: the matcher compares
+    ints, and the real line text is only touched for emitted hunks. Same
+    output shape as difflib.unified_diff with lineterm="".
+    """
+    table: dict = {}
+
+    def _tokens(lines):
+        return [table.setdefault(line, len(table)) for line in lines]
+
+    matcher = difflib.SequenceMatcher(
+        a=_tokens(old_lines), b=_tokens(new_lines), autojunk=False
+    )
+
+    out = []
+    for group in matcher.get_grouped_opcodes(3):
+        if not out:
+            out.append(f"--- {fromfile}")
+            out.append(f"+++ {tofile}")
+        first, last = group[0], group[-1]
+        old_range = _format_hunk_range(first[1], last[2])
+        new_range = _format_hunk_range(first[3], last[4])
+        out.append(f"@@ -{old_range} +{new_range} @@")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in old_lines[i1:i2]:
+                    out.append(" " + line)
+                continue
+            if tag in ("replace", "delete"):
+                for line in old_lines[i1:i2]:
+                    out.append("-" + line)
+            if tag in ("replace", "insert"):
+                for line in new_lines[j1:j2]:
+                    out.append("+" + line)
+    return out
+
+
 @mcp.tool()
 def track_file_modification_tool(
     package_name: str,
@@ -94,49 +409,29 @@ def track_file_modification_tool(
         Tracking results
     """
     try:
-        if package_name not in server_state["modification_history"]:
-            server_state["modification_history"][package_name] = []
-
-        old_lines = old_content.splitlines(keepends=True)
-        new_lines = new_content.splitlines(keepends=True)
-
-        # Calculate the difference
-        diff = []
-        for i, line in enumerate(
-            difflib.unified_diff(old_lines, new_lines, lineterm="")
-        ):
-            if i < 3:
-                continue
-            if line.startswith("+"):
-                diff.append(
-                    {
-                        "operation": "add",
-                        "line_number": i - 2,
-                        "content": line[1:].rstrip("\n"),
-                    }
-                )
-            elif line.startswith("-"):
-                diff.append(
-                    {
-                        "operation": "delete",
-                        "line_number": i - 2,
-                        "content": line[1:].rstrip("\n"),
-                    }
-                )
-            elif line.startswith(" "):
-                diff.append(
-                    {
-                        "operation": "keep",
-                        "line_number": i - 2,
-                        "content": line[1:].rstrip("\n"),
-                    }
-                )
+        # Bounded history: the prompt only ever shows recent changes, so
+        # there is no point keeping (and re-rendering) an unbounded list
+        history = server_state["modification_history"].setdefault(
+            package_name, deque(maxlen=50)
+        )
+
+        # Fast path: the LLM often "rewrites" a file without real changes
+        if old_content == new_content:
+            return f"No changes to track for {file_path}"
+
+        # Calculate the difference; context lines never reach the prompt,
+        # so drop them at insertion and truncate content up front
+        diff = _structured_line_diff(old_content, new_content, include_context=False)
+        for change in diff:
+            change["content"] = change["content"][:200]
 
-        # Storage differences
-        server_state["modification_history"][package_name].append(
+        # Storage differences ("seq" is monotonic so renders can resume
+        # even after old entries rotate out of the deque)
+        history.append(
             {
                 "file_path": file_path,
                 "diff": diff,
+                "seq": (history[-1]["seq"] + 1) if history else 1,
                 "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             }
         )
@@ -146,6 +441,9 @@ def track_file_modification_tool(
         return f"Error tracking modification: {str(e)}"
 
 
+_BUILD_OK_RE = re.compile(r"success|succeeded|passed|\bok\b", re.IGNORECASE)
+
+
 @mcp.tool()
 def parse_build_result_tool(result_content: str, package_name: str) -> str:
     """
@@ -158,13 +456,10 @@ def parse_build_result_tool(result_content: str, package_name: str) -> str:
     """
     try:
         status = result_content.split(": ", 1)[-1]
-        low = status.lower()
-        success = any(
-            k in low for k in ["success", "succeeded", "successfully", "passed", "ok"]
-        )
-        return json.dumps({"success": success, "status": status})
+        success = _BUILD_OK_RE.search(status) is not None
+        return _jd({"success": success, "status": status})
     except Exception:
-        return json.dumps({"success": False, "status": "Unknown (parse error)"})
+        return _jd({"success": False, "status": "Unknown (parse error)"})
 
 
 @mcp.tool()
@@ -180,31 +475,48 @@ def update_prompt_with_history_tool(
     Returns:
         JSON string containing the updated message list
     """
-    current_prompt = (
-        f"Please analyze and repair package {package_name} in: {package_path}. "
-    )
-    current_prompt += "All modifications must be done in the temporary directory. "
-
-    # Add historical modification records
+    parts = [
+        f"Please analyze and repair package {package_name} in: {package_path}. ",
+        "All modifications must be done in the temporary directory. ",
+    ]
+
+    # Add historical modification records. Earlier attempts' entries never
+    # change, so keep their rendered text cached and only format the tail
+    # appended since the last call.
     if build_attempt > 1:
         prev_modifications = server_state["modification_history"].get(package_name, [])
         if prev_modifications:
-            current_prompt += "\n\nPrevious modifications:\n"
+            cached_seq, cached_text = server_state["prompt_cache"].get(
+                package_name, (0, "")
+            )
+            if cached_seq > prev_modifications[-1]["seq"]:  # history was reset
+                cached_seq, cached_text = 0, ""
+            tail = [cached_text]
             for mod in prev_modifications:
-                current_prompt += f"File: {mod['file_path']}\n"
-                current_prompt += "Changes:\n"
+                if mod["seq"] <= cached_seq:
+                    continue
+                tail.append(f"File: {mod['file_path']}\nChanges:\n")
                 for change in mod["diff"]:
                     op = change["operation"]
                     line = change["line_number"]
                     content = change["content"][:200]
-                    current_prompt += f"- Line {line} ({op}): {content}\n"
-                current_prompt += "\n"
-        current_prompt += f"After {build_attempt - 1} attempts, build still failed. "
-        current_prompt += (
+                    tail.append(f"- Line {line} ({op}): {content}\n")
+                tail.append("\n")
+            rendered = "".join(tail)
+            server_state["prompt_cache"][package_name] = (
+                prev_modifications[-1]["seq"],
+                rendered,
+            )
+            parts.append("\n\nPrevious modifications:\n")
+            parts.append(rendered)
+        parts.append(f"After {build_attempt - 1} attempts, build still failed. ")
+        parts.append(
             "Analyze previous modifications and failures, then provide new repair plan."
         )
 
-    return json.dumps(
+    current_prompt = "".join(parts)
+
+    return _jd(
         {
             "messages": [
                 {"role": "system", "content": formatted_prompt},
@@ -215,17 +527,26 @@ def update_prompt_with_history_tool(
 
 
 @mcp.tool()
-def get_file_content_tool(file_path: str) -> str:
+def get_file_content_tool(file_path: str, max_bytes: int = 1 << 20) -> str:
     """
     Get file contents
     Args:
         file_path: Absolute file path
+        max_bytes: Cap on returned bytes for large files (LLM context
+            truncates long inputs anyway)
     Returns:
         File contents
     """
     try:
         if not os.path.exists(file_path):
             return f"Error: File not found - {file_path}"
+        # For big (log-like) files, mmap skips the buffered-reader state
+        # machine and only materializes the slice we actually return
+        if os.path.getsize(file_path) > 64 * 1024:
+            with open(file_path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    data = mm[:max_bytes]
+            return data.decode("utf-8", errors="replace")
         with open(file_path, "r", encoding="utf-8") as f:
             return f.read()
     except Exception as e:
@@ -246,18 +567,18 @@ def check_repeat_tool_call(
         JSON string containing the check results
     """
     call_key = args_key
-    if package_name not in server_state["tool_call_history"]:
-        server_state["tool_call_history"][package_name] = []
+    # Counter lookup is O(1) instead of an O(N) list scan per check
+    history = server_state["tool_call_history"].setdefault(package_name, Counter())
 
-    repeat_count = server_state["tool_call_history"][package_name].count(call_key)
+    repeat_count = history[call_key]
     if repeat_count >= max_repeat:
-        return json.dumps(
+        return _jd(
             {
                 "allowed": False,
                 "message": f"Tool call {tool_name} exceeded max repeat count ({max_repeat})",
             }
         )
-    return json.dumps({"allowed": True, "message": "Tool call allowed"})
+    return _jd({"allowed": True, "message": "Tool call allowed"})
 
 
 @mcp.tool()
@@ -271,14 +592,16 @@ def check_tool_cache(call_key: str, tool_name: str, package_name: str) -> str:
     Returns:
         JSON string containing the cache check results
     """
-    if package_name not in server_state["tool_cache"]:
-        server_state["tool_cache"][package_name] = {}
+    cache = server_state["tool_cache"].setdefault(package_name, {})
 
-    if call_key in server_state["tool_cache"][package_name]:
-        return json.dumps(
-            {"hit": True, "result": server_state["tool_cache"][package_name][call_key]}
-        )
-    return json.dumps({"hit": False, "result": ""})
+    if call_key in cache:
+        return _jd({"hit": True, "result": cache[call_key]})
+    # Fall back to the on-disk cache (survives restarts)
+    result = _disk_cache_get(call_key, package_name)
+    if result is not None:
+        cache[call_key] = result
+        return _jd({"hit": True, "result": result})
+    return _jd({"hit": False, "result": ""})
 
 
 @mcp.tool()
@@ -292,9 +615,67 @@ def cache_tool_result(call_key: str, result: str, package_name: str) -> str:
     Returns:
         Cache result
     """
-    if package_name not in server_state["tool_cache"]:
-        server_state["tool_cache"][package_name] = {}
-    server_state["tool_cache"][package_name][call_key] = result
+    server_state["tool_cache"].setdefault(package_name, {})[call_key] = result
+    _disk_cache_put(call_key, result, package_name)
+    return f"Successfully cached result for {call_key}"
+
+
+@mcp.tool()
+def prepare_tool_call(
+    tool_name: str, args_key: str, package_name: str, max_repeat: int = 3) -> str:
+    """
+    Combined pre-flight for a tool call: repeat check + cache lookup +
+    history record in a single roundtrip (instead of three separate calls).
+    Args:
+        tool_name: Tool name
+        args_key: Argument key
+        package_name: Package name
+        max_repeat: Maximum repeat count
+    Returns:
+        JSON string with allowed/hit/result/message fields
+    """
+    history = server_state["tool_call_history"].setdefault(package_name, Counter())
+    repeat_count = history[args_key]
+    if repeat_count >= max_repeat:
+        return _jd(
+            {
+                "allowed": False,
+                "hit": False,
+                "result": "",
+                "message": f"Tool call {tool_name} exceeded max repeat count ({max_repeat})",
+            }
+        )
+
+    cache = server_state["tool_cache"].setdefault(package_name, {})
+    result = cache.get(args_key)
+    if result is None:
+        result = _disk_cache_get(args_key, package_name)
+        if result is not None:
+            cache[args_key] = result
+    history[args_key] += 1
+    return _jd(
+        {
+            "allowed": True,
+            "hit": result is not None,
+            "result": result or "",
+            "message": "Tool call allowed",
+        }
+    )
+
+
+@mcp.tool()
+def finalize_tool_call(call_key: str, result: str, package_name: str) -> str:
+    """
+    Post-flight counterpart of prepare_tool_call: cache the tool result.
+    Args:
+        call_key: Call key
+        result: Result content
+        package_name: Package name
+    Returns:
+        Finalize result
+    """
+    server_state["tool_cache"].setdefault(package_name, {})[call_key] = result
+    _disk_cache_put(call_key, result, package_name)
     return f"Successfully cached result for {call_key}"
 
 
@@ -302,7 +683,7 @@ def cache_tool_result(call_key: str, result: str, package_name: str) -> str:
 def reset_package_cache_tool(package_name: str) -> str:
     """
     Clear per-package caches for a new attempt.
-    - Clears: tool_cache and tool_call_history
+    - Clears: tool_cache (memory and on-disk) and tool_call_history
     - Keeps:  modification_history (so dynamic prompt can use it)
     """
     # initialize keys if missing
@@ -316,7 +697,18 @@ def reset_package_cache_tool(package_name: str) -> str:
     if package_name in server_state["tool_call_history"]:
         server_state["tool_call_history"][package_name].clear()
 
-    return json.dumps(
+    # drop the package's persisted entries too — without this, keys whose
+    # sandbox hash is state-independent would survive the reset
+    try:
+        conn = _disk_cache()
+        conn.execute("DELETE FROM tool_cache WHERE package = ?", (package_name,))
+        conn.commit()
+    except sqlite3.Error:
+        pass
+    _prewrite_hashes.pop(package_name, None)
+    _invalidate_sandbox_hash(package_name)
+
+    return _jd(
         {
             "success": True,
             "message": f"Cleared tool_cache and tool_call_history for package '{package_name}'.",
@@ -334,9 +726,9 @@ def record_tool_call_history(call_key: str, package_name: str) -> str:
     Returns:
         Record result
     """
-    if package_name not in server_state["tool_call_history"]:
-        server_state["tool_call_history"][package_name] = []
-    server_state["tool_call_history"][package_name].append(call_key)
+    server_state["tool_call_history"].setdefault(package_name, Counter())[
+        call_key
+    ] += 1
     return f"Recorded tool call history for {package_name}"
 
 
@@ -347,7 +739,30 @@ def get_structure_of_files(package_path) -> dict:
     Args:
         package_path (str): Package path.
     """
-    return get_project_structure_from_local(package_path)
+    # Agents request the structure repeatedly; key the cache on the
+    # directory mtime so any write into the package invalidates it.
+    key = (package_path, os.stat(package_path).st_mtime_ns)
+    structure_cache = server_state["tool_cache"].setdefault("_structure", {})
+    cached = structure_cache.get(key)
+    if cached is not None:
+        return cached
+
+    structure = get_project_structure_from_local(package_path)
+    structure_cache[key] = structure
+    return structure
+
+
+def _package_name_for_path(file_path: str) -> str:
+    """
+    Resolve which package a path belongs to. Prefers the sandbox dirs
+    registered by init_package_environment_tool; falls back to the second
+    path component for paths outside any known sandbox.
+    """
+    norm = file_path.replace("\\", "/")
+    for name, pkg_dir in server_state["package_dirs"].items():
+        if norm.startswith(pkg_dir.replace("\\", "/").rstrip("/") + "/"):
+            return name
+    return norm.split("/", 2)[1]
 
 
 @mcp.tool()
@@ -362,37 +777,38 @@ def modify_file_tool(file_path: str, new_content: str):
         if not os.path.exists(file_path):
             return f"Error: File does not exist - {file_path}"
 
-        package_name = file_path.split("/")[1]
+        package_name = _package_name_for_path(file_path)
         diff_log_path = f"data/case_study/{package_name}_diff.log"
 
         # read old content
         with open(file_path, "r", encoding="utf-8") as f:
-            old_lines = f.readlines()
-        new_lines = new_content.splitlines(keepends=True)
-
-        # generate diff
-        diff = list(
-            difflib.unified_diff(
-                old_lines,
-                new_lines,
-                fromfile=f"{file_path} (old)",
-                tofile=f"{file_path} (new)",
-                lineterm="",
-            )
+            old_content = f.read()
+
+        # Fast path: identical content needs no diff, no log, no write
+        if old_content == new_content:
+            return f"No-op: content of {file_path} is unchanged"
+
+        # generate diff (interned-line matcher; see _unified_diff_fast)
+        diff = _unified_diff_fast(
+            old_content.splitlines(),
+            new_content.splitlines(),
+            fromfile=f"{file_path} (old)",
+            tofile=f"{file_path} (new)",
         )
 
-        # write diff to log (with timestamp)
+        # hand the diff log off to the background writer (one write per call)
         if diff:
-            with open(diff_log_path, "a", encoding="utf-8") as log:
-                log.write("\n" + "=" * 80 + "\n")
-                log.write(f"Timestamp: {datetime.now()}\n")
-                log.write(f"File: {file_path}\n")
-                log.write(f"Diff lines: {len(diff)}\n\n")
-                for line in diff:
-                    log.write(line + "\n")
+            header = (
+                "\n" + "=" * 80 + "\n"
+                f"Timestamp: {datetime.now()}\n"
+                f"File: {file_path}\n"
+                f"Diff lines: {len(diff)}\n\n"
+            )
+            _log_queue.put((diff_log_path, header + "\n".join(diff) + "\n"))
 
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(new_content)
+        _invalidate_sandbox_hash(package_name)
 
         return (
             f"Success: Replaced content of {file_path}\nPreview: {new_content[:100]}..."
@@ -408,12 +824,23 @@ SUPPORTED_FORMATS = {
     "tar.bz2": {"extensions": [".tar.bz2", ".tbz"], "mode": "r:bz2"},
     "zip": {"extensions": [".zip"], "mode": "r"},
 }
+# Flattened extension -> (format, mode) lookup, longest extensions first so
+# ".tar.gz" wins over a hypothetical ".gz"
+_EXT_MAP = {
+    ext: (fmt, info["mode"])
+    for fmt, info in SUPPORTED_FORMATS.items()
+    for ext in info["extensions"]
+}
+_EXT_MAP = dict(sorted(_EXT_MAP.items(), key=lambda kv: -len(kv[0])))
+
+
 def get_archive_format(file_path: str) -> tuple:
     """Determine archive format"""
-    for fmt, info in SUPPORTED_FORMATS.items():
-        for ext in info["extensions"]:
-            if file_path.lower().endswith(ext):
-                return (fmt, info["mode"])
+    # Only the suffix matters; avoid lowercasing the whole path
+    lo = file_path[-8:].lower()
+    for ext, fmt_mode in _EXT_MAP.items():
+        if lo.endswith(ext):
+            return fmt_mode
     return (None, None)
 
 
@@ -436,16 +863,16 @@ def extract_archive_tool(package_path: str):
 
         elif os.path.isdir(package_path):
             found = False
-            for item in os.listdir(package_path):
-                item_path = os.path.join(package_path, item)
-                if os.path.isfile(item_path):
-                    fmt, _ = get_archive_format(item_path)
-                    if fmt:
-                        archive_path = item_path
-                        archive_file = item
-                        package_dir = package_path
-                        found = True
-                        break
+            with os.scandir(package_path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        fmt, _ = get_archive_format(entry.path)
+                        if fmt:
+                            archive_path = entry.path
+                            archive_file = entry.name
+                            package_dir = package_path
+                            found = True
+                            break
 
             if not found:
                 return f"Error: No supported archive in '{package_path}'"
@@ -460,18 +887,54 @@ def extract_archive_tool(package_path: str):
 
         fmt, mode = get_archive_format(archive_path)
         if fmt in ["tar.gz", "tar.xz", "tar.bz2"]:
-            with tarfile.open(archive_path, mode) as tar:
-                tar.extractall(extract_dir)
+            # tarfile copies members through shutil.copyfileobj with the
+            # default 16 KiB buffer; a 1 MiB buffer cuts syscalls ~64x
+            saved_bufsize = shutil.COPY_BUFSIZE
+            shutil.COPY_BUFSIZE = 1 << 20
+            try:
+                with tarfile.open(archive_path, mode, bufsize=1 << 20) as tar:
+                    tar.extractall(extract_dir)
+            finally:
+                shutil.COPY_BUFSIZE = saved_bufsize
         elif fmt == "zip":
             with zipfile.ZipFile(archive_path, "r") as zip_ref:
-                zip_ref.extractall(extract_dir)
-
+                # manual extraction loop so the member copy uses a big buffer
+                for member in zip_ref.infolist():
+                    # extractall() sanitizes member names; mirror that here so
+                    # a hostile archive (absolute paths, .. components) cannot
+                    # write outside extract_dir
+                    parts = [
+                        p
+                        for p in member.filename.replace("\\", "/").split("/")
+                        if p and p not in (".", "..") and ":" not in p
+                    ]
+                    if not parts:
+                        continue
+                    target = os.path.join(extract_dir, *parts)
+                    if member.is_dir():
+                        os.makedirs(target, exist_ok=True)
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with zip_ref.open(member) as src:
+                        with open(target, "wb") as dst:
+                            shutil.copyfileobj(src, dst, 1 << 20)
+
+        _invalidate_sandbox_hash(_package_name_for_path(extract_dir))
         return f"Successfully extracted {archive_file} to {extract_dir}"
 
     except Exception as e:
         return f"Extraction failed: {str(e)}"
 
 
+def _parallel_compressor(fmt: str):
+    """Command line for a multi-threaded compressor on PATH, or None."""
+    if fmt == "tar.gz" and shutil.which("pigz"):
+        return ["pigz", "-p", str(os.cpu_count() or 1), "-1"]
+    if fmt == "tar.xz" and shutil.which("xz"):
+        return ["xz", "-T0", "-1"]
+    return None
+
+
 @mcp.tool()
 def compress_to_archive_tool(package_path: str):
     """Compress extracted directory back to original format"""
@@ -488,14 +951,14 @@ def compress_to_archive_tool(package_path: str):
 
         original_archive = None
         original_fmt = None
-        for item in os.listdir(package_path):
-            item_path = os.path.join(package_path, item)
-            if os.path.isfile(item_path):
-                fmt, _ = get_archive_format(item_path)
-                if fmt:
-                    original_archive = item_path
-                    original_fmt = fmt
-                    break
+        with os.scandir(package_path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    fmt, _ = get_archive_format(entry.path)
+                    if fmt:
+                        original_archive = entry.path
+                        original_fmt = fmt
+                        break
 
         if not original_archive:
             return f"Error: No original archive in '{package_path}'"
@@ -506,21 +969,62 @@ def compress_to_archive_tool(package_path: str):
         if os.path.exists(output_archive):
             os.remove(output_archive)
 
-        if original_fmt in ["tar.gz", "tar.xz", "tar.bz2"]:
+        compressor = _parallel_compressor(original_fmt)
+        if compressor:
+            # Pipe the tar stream through pigz/xz so the deflate work fans
+            # out across cores; tarfile only pays the archiving cost
+            with open(output_archive, "wb") as out:
+                proc = subprocess.Popen(
+                    compressor, stdin=subprocess.PIPE, stdout=out
+                )
+                try:
+                    with tarfile.open(
+                        fileobj=proc.stdin, mode="w|", bufsize=1 << 20
+                    ) as tar:
+                        with os.scandir(extracted_dir) as entries:
+                            for entry in entries:
+                                tar.add(entry.path, arcname=entry.name)
+                finally:
+                    proc.stdin.close()
+                if proc.wait() != 0:
+                    return (
+                        f"Compression failed: {compressor[0]} exited "
+                        f"with {proc.returncode}"
+                    )
+        elif original_fmt == "tar.gz":
+            # Streaming mode over an explicit gzip writer: a large buffer,
+            # fast compression level, and no seek-backs
+            with gzip.GzipFile(output_archive, "wb", compresslevel=1) as gz:
+                with tarfile.open(fileobj=gz, mode="w|", bufsize=1 << 20) as tar:
+                    with os.scandir(extracted_dir) as entries:
+                        for entry in entries:
+                            tar.add(entry.path, arcname=entry.name)
+        elif original_fmt in ["tar.xz", "tar.bz2"]:
             mode = SUPPORTED_FORMATS[original_fmt]["mode"].replace("r", "w")
-            with tarfile.open(output_archive, mode) as tar:
-                for item in os.listdir(extracted_dir):
-                    item_path = os.path.join(extracted_dir, item)
-                    tar.add(item_path, arcname=item)
+            with tarfile.open(output_archive, mode, bufsize=1 << 20) as tar:
+                with os.scandir(extracted_dir) as entries:
+                    for entry in entries:
+                        tar.add(entry.path, arcname=entry.name)
         elif original_fmt == "zip":
-            with zipfile.ZipFile(output_archive, "w", zipfile.ZIP_DEFLATED) as zip_ref:
-                for root, _, files in os.walk(extracted_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, extracted_dir)
-                        zip_ref.write(file_path, arcname)
+            with zipfile.ZipFile(
+                output_archive, "w", zipfile.ZIP_DEFLATED, compresslevel=1
+            ) as zip_ref:
+                # scandir recursion avoids the extra stat per entry os.walk pays
+                def _add_tree(directory):
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                _add_tree(entry.path)
+                            else:
+                                zip_ref.write(
+                                    entry.path,
+                                    os.path.relpath(entry.path, extracted_dir),
+                                )
+
+                _add_tree(extracted_dir)
 
         shutil.rmtree(extracted_dir)
+        _invalidate_sandbox_hash(_package_name_for_path(extracted_dir))
         return f"Success: Compressed to {output_archive}"
 
     except Exception as e:
@@ -533,17 +1037,16 @@ def upload_file_to_obs_tool(package_path: str):
     if not os.path.isdir(package_path):
         return f"Error: '{package_path}' is not a directory"
 
-    has_spec = any(
-        f.endswith(".spec")
-        for f in os.listdir(package_path)
-        if os.path.isfile(os.path.join(package_path, f))
-    )
-    if not has_spec:
+    # One scandir pass serves both the .spec check and the upload list, so
+    # main_upload does not rescan the directory
+    with os.scandir(package_path) as entries:
+        files = [(e.name, e.path) for e in entries if e.is_file()]
+    if not any(name.endswith(".spec") for name, _ in files):
         return f"Error: No .spec file in '{package_path}'"
 
     package_name = os.path.basename(package_path)
     try:
-        obs_result = main_upload(package_name, package_path)
+        obs_result = main_upload(package_name, package_path, prelisted=files)
         if "error" in str(obs_result).lower():
             return f"Upload failed: {obs_result}"
         return f"Upload successful. Result: {obs_result}"
@@ -573,7 +1076,7 @@ def get_packages_to_process(base_dir: str, result_dir: str) -> str:
     """
     try:
         if not os.path.exists(base_dir):
-            return json.dumps(
+            return _jd(
                 {
                     "success": False,
                     "message": f"Base directory not found: {base_dir}",
@@ -581,13 +1084,10 @@ def get_packages_to_process(base_dir: str, result_dir: str) -> str:
                 }
             )
 
-        packages = [
-            item
-            for item in os.listdir(base_dir)
-            if os.path.isdir(os.path.join(base_dir, item))
-        ]
+        with os.scandir(base_dir) as entries:
+            packages = [entry.name for entry in entries if entry.is_dir()]
 
-        return json.dumps(
+        return _jd(
             {
                 "success": True,
                 "message": f"Found {len(packages)} packages",
@@ -595,7 +1095,7 @@ def get_packages_to_process(base_dir: str, result_dir: str) -> str:
             }
         )
     except Exception as e:
-        return json.dumps(
+        return _jd(
             {
                 "success": False,
                 "message": f"Error getting packages: {str(e)}",
@@ -1,7 +1,13 @@
+import array
+import concurrent.futures
+import functools
 import os
+from collections import Counter, defaultdict
 import json
 import shutil
 import difflib
+import subprocess
+import threading
 import time
 import re
 from mcp.server.fastmcp import FastMCP
@@ -9,17 +15,115 @@ from tools.auto_repair.get_repo_structure import get_project_structure_from_loca
 from tools.auto_repair.check_build_res import check_main
 from tools.auto_repair.upload_files import main_upload
 import tarfile
+import uuid
 import zipfile
 from typing import List, Tuple
 
+try:
+    import fcntl
+except ImportError:  # non-POSIX
+    fcntl = None
+
 mcp = FastMCP("auto_repair_server_patch")
 
-# Server-side state storage
+# Server-side state storage, sharded per package. defaultdict drops the
+# "if pkg not in state" guards, and the per-package locks keep writes safe
+# if FastMCP ever dispatches tool calls concurrently — unrelated packages
+# never contend.
 server_state = {
-    "modification_history": {},  # {package_name: [{file_path, diff, timestamp}, ...]}
-    "tool_call_history": {},  # {package_name: [(tool_name, args_key), ...]}
-    "tool_cache": {},  # {package_name: {call_key: result, ...}}
+    "modification_history": defaultdict(list),  # {package_name: [entries]}
+    "tool_call_history": defaultdict(Counter),  # {package_name: Counter}
+    "tool_cache": defaultdict(dict),  # {package_name: {call_key: reply}}
 }
+_state_locks = defaultdict(threading.Lock)
+
+
+def _jd(obj) -> str:
+    """Compact JSON for tool return values: no spaces, no ASCII escaping."""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+_CACHE_MISS_REPLY = _jd({"hit": False, "result": ""})
+
+# History timestamps have 1-second resolution, so records landing within
+# the same second (e.g. a multi-file patch) can share one formatted string
+_ts_cache = [0, ""]
+
+
+def _now_str() -> str:
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[:] = [t, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))]
+    return _ts_cache[1]
+
+def _rmtree_async(path: str) -> None:
+    """
+    Free a directory name with an O(1) rename and run the recursive unlink
+    from a background thread, so callers don't wait out thousands of stat
+    and unlink calls.
+    """
+    trash = f"{path}.trash.{uuid.uuid4().hex[:8]}"
+    try:
+        os.rename(path, trash)
+    except OSError:
+        shutil.rmtree(path)  # locked or already gone halfway: delete in place
+        return
+    threading.Thread(
+        target=shutil.rmtree, args=(trash,), kwargs={"ignore_errors": True},
+        daemon=True,
+    ).start()
+
+
+# FICLONE ioctl: ask the filesystem for a copy-on-write clone
+_FICLONE = 0x40049409
+
+
+def _clone_copy(src, dst, *, follow_symlinks=True):
+    """
+    Copy a file with the cheapest mechanism the kernel offers: a reflink
+    clone (O(1) in file size on Btrfs/XFS), then copy_file_range (in-kernel
+    byte transfer, no userspace round-trip), then plain shutil.copy2.
+    """
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                    shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+                    return dst
+                except OSError:
+                    pass
+            if hasattr(os, "copy_file_range"):
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = 0
+                while copied < size:
+                    n = os.copy_file_range(
+                        fsrc.fileno(), fdst.fileno(), size - copied
+                    )
+                    if n == 0:
+                        break
+                    copied += n
+                if copied >= size:
+                    shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+                    return dst
+    except OSError:
+        pass
+    return shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+
+
+class _MultithreadedCopier(concurrent.futures.ThreadPoolExecutor):
+    """
+    copy_function adapter for shutil.copytree that fans file copies out to a
+    thread pool. The copies release the GIL in their syscalls, so many small
+    files copy with overlapped open/stat/creat latency instead of serially.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+
+    def copy(self, src, dst, *, follow_symlinks=True):
+        self.futures.append(self.submit(_clone_copy, src, dst))
 
 
 @mcp.tool()
@@ -39,30 +143,35 @@ def init_package_environment_tool(
     try:
         package_temp_dir = os.path.join(temp_work_dir, package_name)
         if os.path.exists(package_temp_dir):
-            shutil.rmtree(package_temp_dir)
+            _rmtree_async(package_temp_dir)
         os.makedirs(package_temp_dir, exist_ok=True)
 
         original_package_path = os.path.join(base_dir, package_name)
         if not os.path.exists(original_package_path):
-            return json.dumps(
+            return _jd(
                 {
                     "success": False,
                     "message": f"Original package path not found: {original_package_path}",
                 }
             )
 
-        # Copy the file to a temporary directory
-        for item in os.listdir(original_package_path):
-            src = os.path.join(original_package_path, item)
-            dst = os.path.join(package_temp_dir, item)
-            if os.path.isdir(src):
-                shutil.copytree(src, dst, dirs_exist_ok=True)
-            else:
-                shutil.copy2(src, dst)
+        # Copy the files to a temporary directory, overlapping the per-file
+        # syscall latency across threads
+        with _MultithreadedCopier(
+            max_workers=min(32, (os.cpu_count() or 4) * 4)
+        ) as copier:
+            shutil.copytree(
+                original_package_path,
+                package_temp_dir,
+                copy_function=copier.copy,
+                dirs_exist_ok=True,
+            )
+            for fut in copier.futures:
+                fut.result()
 
         result_file = os.path.join(result_dir, f"{package_name}_result.txt")
 
-        return json.dumps(
+        return _jd(
             {
                 "success": True,
                 "package_temp_dir": package_temp_dir,
@@ -72,11 +181,65 @@ def init_package_environment_tool(
             }
         )
     except Exception as e:
-        return json.dumps(
+        return _jd(
             {"success": False, "message": f"Initialization failed: {str(e)}"}
         )
 
 
+# Per-change op bytes in the struct-of-arrays history layout
+_OP_NAMES = {ord("+"): "add", ord("-"): "delete", ord(" "): "keep"}
+
+
+def _structured_line_diff(old_content: str, new_content: str) -> tuple:
+    """
+    Build the structured add/delete/keep diff used by the modification
+    history. Lines are interned to small ints first so the matcher compares
+    integers instead of strings, which is far faster than formatting a
+    unified diff and re-parsing its text — especially on large files.
+    Returns parallel arrays (ops, line_numbers, contents) — a byte per
+    change ('+'/'-'/' '), its line number, and its text — rather than a
+    list of per-change dicts; the flat layout is several times smaller
+    over a long session.
+    """
+    old_lines = old_content.splitlines()
+    new_lines = new_content.splitlines()
+
+    table: dict = {}
+
+    def _tokens(lines):
+        return [table.setdefault(line, len(table)) for line in lines]
+
+    matcher = difflib.SequenceMatcher(
+        a=_tokens(old_lines), b=_tokens(new_lines), autojunk=False
+    )
+
+    ops = bytearray()
+    nums = array.array("i")
+    contents = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            # Keep only up to 3 context lines on each side of a change
+            span = range(j1, j2)
+            if len(span) > 6:
+                span = list(range(j1, j1 + 3)) + list(range(j2 - 3, j2))
+            for k in span:
+                ops.append(ord(" "))
+                nums.append(k + 1)
+                contents.append(new_lines[k])
+            continue
+        if tag in ("replace", "delete"):
+            for k in range(i1, i2):
+                ops.append(ord("-"))
+                nums.append(k + 1)
+                contents.append(old_lines[k])
+        if tag in ("replace", "insert"):
+            for k in range(j1, j2):
+                ops.append(ord("+"))
+                nums.append(k + 1)
+                contents.append(new_lines[k])
+    return ops, nums, contents
+
+
 @mcp.tool()
 def track_file_modification_tool(
     package_name: str,
@@ -97,58 +260,29 @@ def track_file_modification_tool(
         Tracking results
     """
     try:
-        if package_name not in server_state["modification_history"]:
-            server_state["modification_history"][package_name] = []
-
-        old_lines = old_content.splitlines(keepends=True)
-        new_lines = new_content.splitlines(keepends=True)
-
         # Calculate the difference
-        diff = []
-        for i, line in enumerate(
-            difflib.unified_diff(old_lines, new_lines, lineterm="")
-        ):
-            if i < 3:
-                continue
-            if line.startswith(""):
-                diff.append(
-                    {
-                        "operation": "add",
-                        "line_number": i - 2,
-                        "content": line[1:].rstrip("\n"),
-                    }
-                )
-            elif line.startswith("-"):
-                diff.append(
-                    {
-                        "operation": "delete",
-                        "line_number": i - 2,
-                        "content": line[1:].rstrip("\n"),
-                    }
-                )
-            elif line.startswith(" "):
-                diff.append(
-                    {
-                        "operation": "keep",
-                        "line_number": i - 2,
-                        "content": line[1:].rstrip("\n"),
-                    }
-                )
+        ops, nums, contents = _structured_line_diff(old_content, new_content)
 
-        # Storage differences
-        server_state["modification_history"][package_name].append(
-            {
-                "file_path": file_path,
-                "diff": diff,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            }
-        )
+        # Storage differences (struct-of-arrays, see _structured_line_diff)
+        with _state_locks[package_name]:
+            server_state["modification_history"][package_name].append(
+                {
+                    "file_path": file_path,
+                    "ops": ops,
+                    "lines": nums,
+                    "contents": contents,
+                    "timestamp": _now_str(),
+                }
+            )
 
         return f"Successfully tracked modification to {file_path}"
     except Exception as e:
         return f"Error tracking modification: {str(e)}"
 
 
+_BUILD_OK_RE = re.compile(r"success|succeeded|passed|\bok\b", re.IGNORECASE)
+
+
 @mcp.tool()
 def parse_build_result_tool(result_content: str, package_name: str) -> str:
     """
@@ -161,13 +295,10 @@ def parse_build_result_tool(result_content: str, package_name: str) -> str:
     """
     try:
         status = result_content.split(": ", 1)[-1]
-        low = status.lower()
-        success = any(
-            k in low for k in ["success", "succeeded", "successfully", "passed", "ok"]
-        )
-        return json.dumps({"success": success, "status": status})
+        success = _BUILD_OK_RE.search(status) is not None
+        return _jd({"success": success, "status": status})
     except Exception:
-        return json.dumps({"success": False, "status": "Unknown (parse error)"})
+        return _jd({"success": False, "status": "Unknown (parse error)"})
 
 
 @mcp.tool()
@@ -184,31 +315,35 @@ def update_prompt_with_history_tool(
     Returns:
         JSON string containing the updated message list
     """
-    current_prompt = (
-        f"Please analyze and repair package {package_name} in: {package_path}. "
-    )
-    current_prompt = "All modifications must be done in the temporary directory. "
+    # list.append + join: every line here used to *reassign* current_prompt,
+    # so only the final sentence ever reached the LLM
+    parts = [
+        f"Please analyze and repair package {package_name} in: {package_path}. ",
+        "All modifications must be done in the temporary directory. ",
+    ]
 
     # Add historical modification records
     if build_attempt > 1:
         prev_modifications = server_state["modification_history"].get(package_name, [])
         if prev_modifications:
-            current_prompt = "\n\nPrevious modifications:\n"
+            parts.append("\n\nPrevious modifications:\n")
             for mod in prev_modifications:
-                current_prompt = f"File: {mod['file_path']}\n"
-                current_prompt = "Changes:\n"
-                for change in mod["diff"]:
-                    op = change["operation"]
-                    line = change["line_number"]
-                    content = change["content"][:200]
-                    current_prompt = f"- Line {line} ({op}): {content}\n"
-                current_prompt = "\n"
-        current_prompt = f"After {build_attempt - 1} attempts, build still failed. "
-        current_prompt = (
+                parts.append(f"File: {mod['file_path']}\nChanges:\n")
+                for op, line, content in zip(
+                    mod.get("ops", b""), mod.get("lines", ()), mod.get("contents", ())
+                ):
+                    parts.append(
+                        f"- Line {line} ({_OP_NAMES[op]}): {content[:200]}\n"
+                    )
+                parts.append("\n")
+        parts.append(f"After {build_attempt - 1} attempts, build still failed. ")
+        parts.append(
             "Analyze previous modifications and failures, then provide new repair plan."
         )
 
-    return json.dumps(
+    current_prompt = "".join(parts)
+
+    return _jd(
         {
             "messages": [
                 {"role": "system", "content": formatted_prompt},
@@ -218,6 +353,12 @@ def update_prompt_with_history_tool(
     )
 
 
+@functools.lru_cache(maxsize=512)
+def _read_cached(file_path: str, mtime_ns: int) -> str:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
 @mcp.tool()
 def get_file_content_tool(file_path: str) -> str:
     """
@@ -230,8 +371,9 @@ def get_file_content_tool(file_path: str) -> str:
     try:
         if not os.path.exists(file_path):
             return f"Error: File not found - {file_path}"
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+        # mtime is part of the cache key, so any write (which bumps it)
+        # misses naturally and stale entries simply age out of the LRU
+        return _read_cached(file_path, os.stat(file_path).st_mtime_ns)
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
@@ -251,18 +393,15 @@ def check_repeat_tool_call(
         JSON string containing the check results
     """
     call_key = args_key
-    if package_name not in server_state["tool_call_history"]:
-        server_state["tool_call_history"][package_name] = []
-
-    repeat_count = server_state["tool_call_history"][package_name].count(call_key)
+    repeat_count = server_state["tool_call_history"][package_name][call_key]
     if repeat_count >= max_repeat:
-        return json.dumps(
+        return _jd(
             {
                 "allowed": False,
                 "message": f"Tool call {tool_name} exceeded max repeat count ({max_repeat})",
             }
         )
-    return json.dumps({"allowed": True, "message": "Tool call allowed"})
+    return _jd({"allowed": True, "message": "Tool call allowed"})
 
 
 @mcp.tool()
@@ -276,14 +415,12 @@ def check_tool_cache(call_key: str, tool_name: str, package_name: str) -> str:
     Returns:
         JSON string containing the cache check results
     """
-    if package_name not in server_state["tool_cache"]:
-        server_state["tool_cache"][package_name] = {}
-
-    if call_key in server_state["tool_cache"][package_name]:
-        return json.dumps(
-            {"hit": True, "result": server_state["tool_cache"][package_name][call_key]}
-        )
-    return json.dumps({"hit": False, "result": ""})
+    # Entries are stored as fully rendered replies, so a hit is returned
+    # as-is instead of re-encoding the (possibly large) result every time
+    cached = server_state["tool_cache"][package_name].get(call_key)
+    if cached is not None:
+        return cached
+    return _CACHE_MISS_REPLY
 
 
 @mcp.tool()
@@ -297,9 +434,11 @@ def cache_tool_result(call_key: str, result: str, package_name: str) -> str:
     Returns:
         Cache result
     """
-    if package_name not in server_state["tool_cache"]:
-        server_state["tool_cache"][package_name] = {}
-    server_state["tool_cache"][package_name][call_key] = result
+    # Encode the hit reply once at store time; see check_tool_cache
+    with _state_locks[package_name]:
+        server_state["tool_cache"][package_name][call_key] = _jd(
+            {"hit": True, "result": result}
+        )
     return f"Successfully cached result for {call_key}"
 
 
@@ -310,18 +449,12 @@ def reset_package_cache_tool(package_name: str) -> str:
     - Clears: tool_cache and tool_call_history
     - Keeps:  modification_history (so dynamic prompt can use it)
     """
-    # initialize keys if missing
-    server_state.setdefault("tool_cache", {})
-    server_state.setdefault("tool_call_history", {})
-    server_state.setdefault("modification_history", {})
-
-    # clear cache  call history for this package
-    if package_name in server_state["tool_cache"]:
+    # clear cache + call history for this package
+    with _state_locks[package_name]:
         server_state["tool_cache"][package_name].clear()
-    if package_name in server_state["tool_call_history"]:
         server_state["tool_call_history"][package_name].clear()
 
-    return json.dumps(
+    return _jd(
         {
             "success": True,
             "message": f"Cleared tool_cache and tool_call_history for package '{package_name}'.",
@@ -339,12 +472,16 @@ def record_tool_call_history(call_key: str, package_name: str) -> str:
     Returns:
         Record result
     """
-    if package_name not in server_state["tool_call_history"]:
-        server_state["tool_call_history"][package_name] = []
-    server_state["tool_call_history"][package_name].append(call_key)
+    with _state_locks[package_name]:
+        server_state["tool_call_history"][package_name][call_key] += 1
     return f"Recorded tool call history for {package_name}"
 
 
+@functools.lru_cache(maxsize=64)
+def _structure_cached(package_path: str, mtime_ns: int) -> dict:
+    return get_project_structure_from_local(package_path)
+
+
 @mcp.tool()
 def get_structure_of_files(package_path) -> dict:
     """
@@ -352,7 +489,17 @@ def get_structure_of_files(package_path) -> dict:
     Args:
         package_path (str): Package path.
     """
-    return get_project_structure_from_local(package_path)
+    # Agents request the structure repeatedly; key the cache on the
+    # directory mtime so top-level changes invalidate it. Nested writes do
+    # not bump the root mtime, so apply_git_unified_patch_tool clears this
+    # cache explicitly after a successful apply.
+    return _structure_cached(package_path, os.stat(package_path).st_mtime_ns)
+
+
+# Patch-header patterns, compiled once instead of per hunk
+_RE_OLD = re.compile(r"^---\s+(.*)$")
+_RE_NEW = re.compile(r"^\+\+\+\s+(.*)$")
+_RE_HUNK = re.compile(r"^@@\s*-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@")
 
 
 def _parse_git_unified_patch(patch_text: str):
@@ -375,20 +522,20 @@ def _parse_git_unified_patch(patch_text: str):
         hunks = []
 
         # skip until see --- / +++
-        while start < n and not lines[start].startswith("--- "):
+        while start < n and lines[start][:4] != "--- ":
             start += 1
         if start >= n:
             return start, None
 
         # line ---
-        m = re.match(r"^---\s+(.*)$", lines[start])
+        m = _RE_OLD.match(lines[start])
         start += 1
         old_tok = m.group(1).strip() if m else None
 
         # line +++
-        if start >= n or not lines[start].startswith("+++ "):
+        if start >= n or lines[start][:4] != "+++ ":
             raise ValueError("Bad patch: expected '+++' after '---'")
-        m = re.match(r"^\+\+\+\s+(.*)$", lines[start])
+        m = _RE_NEW.match(lines[start])
         start += 1
         new_tok = m.group(1).strip() if m else None
 
@@ -405,13 +552,10 @@ def _parse_git_unified_patch(patch_text: str):
             new_path = new_tok[2:] if new_tok.startswith("b/") else new_tok
 
         # read hunks
-        while start < n and lines[start].startswith("@@"):
+        while start < n and lines[start][:2] == "@@":
             hdr = lines[start]
             start += 1
-            m = re.match(
-                r"^@@\s*-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@.*$",
-                hdr.rstrip("\r"),
-            )
+            m = _RE_HUNK.match(hdr.rstrip("\r"))
             if not m:
                 raise ValueError(f"Bad hunk header: {hdr}")
             a_l = int(m.group(1))
@@ -419,13 +563,16 @@ def _parse_git_unified_patch(patch_text: str):
             b_l = int(m.group(3))
             b_s = int(m.group(4) or 1)
             body = []
-            while (
-                start < n
-                and not lines[start].startswith("@@")
-                and not lines[start].startswith("diff --git")
-                and not lines[start].startswith("--- ")
-            ):
-                body.append(lines[start])
+            append = body.append  # body loop runs once per patch line
+            while start < n:
+                line = lines[start]
+                if (
+                    line[:2] == "@@"
+                    or line[:4] == "--- "
+                    or line[:10] == "diff --git"
+                ):
+                    break
+                append(line)
                 start += 1
             hunks.append((a_l, a_s, b_l, b_s, body))
 
@@ -458,39 +605,49 @@ def _apply_hunks_strict(
 ) -> Tuple[List[str], bool]:
     """
     Strictly apply hunks (no fuzzy matching). orig_lines/returned lines contain newline characters.
+    Builds the output in one forward pass over the original, so H hunks
+    cost O(N) instead of the O(H*N) of splicing into a working copy.
     """
-    new_lines = orig_lines[:]
-    line_offset = 0
+    out: List[str] = []
+    src_idx = 0
+    n_orig = len(orig_lines)
     for a_l, a_s, b_l, b_s, body in hunks:
-        start = a_l - 1 + line_offset
-        cur = start
-        replacement = []
+        # A zero-length old range (@@ -N,0 / new files' @@ -0,0) means
+        # "insert after line N", not "at line N"
+        start = a_l if a_s == 0 else a_l - 1
+        if start < src_idx:  # overlapping/unsorted hunks
+            return orig_lines, False
+        out.extend(orig_lines[src_idx:start])
+        src_idx = start
+        # Fast path: agent-generated patches are frequently add-only (new
+        # files, appended blocks); those need no context checks at all
+        if all(l[:1] == "+" for l in body):
+            out.extend(l[1:] + "\n" for l in body)
+            continue
         for raw in body:
-            if raw.startswith("+"):
-                replacement.append(raw[1:] + "\n")
-            elif raw.startswith(" "):
-                if cur >= len(new_lines):
+            c = raw[:1]  # one slice, then cheap equality dispatch
+            if c == "+":
+                out.append(raw[1:] + "\n")
+            elif c == " ":
+                if src_idx >= n_orig:
                     return orig_lines, False
-                if new_lines[cur].rstrip("\n") != raw[1:]:
+                if orig_lines[src_idx].rstrip("\n") != raw[1:]:
                     return orig_lines, False
-                replacement.append(new_lines[cur])
-                cur += 1
-            elif raw.startswith("-"):
-                if cur >= len(new_lines):
+                out.append(orig_lines[src_idx])
+                src_idx += 1
+            elif c == "-":
+                if src_idx >= n_orig:
                     return orig_lines, False
-                if new_lines[cur].rstrip("\n") != raw[1:]:
+                if orig_lines[src_idx].rstrip("\n") != raw[1:]:
                     return orig_lines, False
-                cur += 1
+                src_idx += 1
             else:
-                if cur >= len(new_lines):
+                if src_idx >= n_orig:
                     return orig_lines, False
-                replacement.append(new_lines[cur])
-                cur += 1
-        before_len = len(new_lines)
-        new_lines[start:cur] = replacement
-        after_len = len(new_lines)
-        line_offset += (after_len - before_len) - (cur - start)
-    return new_lines, True
+                out.append(orig_lines[src_idx])
+                src_idx += 1
+    out.extend(orig_lines[src_idx:])
+    return out, True
 
 
 @mcp.tool()
@@ -555,11 +712,12 @@ def apply_git_unified_patch_tool(
             if not ok:
                 return f"Error: Hunk failed for {target_rel}. Ensure exact context lines and correct ranges."
 
-            # Write back new/modified content
+            # Write back new/modified content: stream the lines through a
+            # buffered binary handle instead of joining one giant string
             if not is_delete:
                 os.makedirs(os.path.dirname(target_abs), exist_ok=True)
-                with open(target_abs, "w", encoding="utf-8") as fw:
-                    fw.write("".join(new_lines))
+                with open(target_abs, "wb", buffering=1 << 20) as fw:
+                    fw.writelines(line.encode("utf-8") for line in new_lines)
 
             applied.append(
                 f"{'A' if is_new else ('D' if is_delete else 'M')} {target_rel}"
@@ -568,14 +726,19 @@ def apply_git_unified_patch_tool(
             # Record history
             if record_history:
                 pkg = os.path.basename(root.rstrip(os.sep))
-                server_state.setdefault("modification_history", {})
-                server_state["modification_history"].setdefault(pkg, []).append(
-                    {
-                        "file_path": target_rel,
-                        "operation": "git_unified_patch",
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    }
-                )
+                with _state_locks[pkg]:
+                    server_state["modification_history"][pkg].append(
+                        {
+                            "file_path": target_rel,
+                            "operation": "git_unified_patch",
+                            "timestamp": _now_str(),
+                        }
+                    )
+
+        # The structure cache keys on the package root's mtime, which only
+        # moves when a direct child changes — a patched file in a
+        # subdirectory would leave stale entries behind
+        _structure_cached.cache_clear()
 
         return "Success: applied patch\n" + "\n".join(applied)
     except Exception as e:
@@ -590,15 +753,38 @@ SUPPORTED_FORMATS = {
 }
 
 
+# Flattened extension -> (format, mode) lookup, longest extensions first so
+# ".tar.gz" wins over a hypothetical ".gz"
+_EXT_MAP = {
+    ext: (fmt, info["mode"])
+    for fmt, info in SUPPORTED_FORMATS.items()
+    for ext in info["extensions"]
+}
+_EXT_MAP = dict(sorted(_EXT_MAP.items(), key=lambda kv: -len(kv[0])))
+
+
 def get_archive_format(file_path: str) -> tuple:
     """Determine archive format"""
-    for fmt, info in SUPPORTED_FORMATS.items():
-        for ext in info["extensions"]:
-            if file_path.lower().endswith(ext):
-                return (fmt, info["mode"])
+    # Only the suffix matters; avoid lowercasing the whole path
+    lo = file_path[-8:].lower()
+    for ext, fmt_mode in _EXT_MAP.items():
+        if lo.endswith(ext):
+            return fmt_mode
     return (None, None)
 
 
+# Multi-threaded external compressors, used through `tar -I` when present
+_TAR_COMPRESSORS = {"tar.gz": "pigz", "tar.xz": "pixz", "tar.bz2": "pbzip2"}
+
+
+def _external_tar_compressor(fmt: str):
+    """Name of a multi-threaded compressor for fmt if tar can use it."""
+    name = _TAR_COMPRESSORS.get(fmt)
+    if name and shutil.which(name) and shutil.which("tar"):
+        return name
+    return None
+
+
 @mcp.tool()
 def extract_archive_tool(package_path: str):
     """Extract archive files in various formats"""
@@ -606,9 +792,10 @@ def extract_archive_tool(package_path: str):
         archive_path = None
         package_dir = None
         archive_file = None
+        fmt = mode = None
 
         if os.path.isfile(package_path):
-            fmt, _ = get_archive_format(package_path)
+            fmt, mode = get_archive_format(package_path)
             if fmt:
                 archive_path = package_path
                 package_dir = os.path.dirname(archive_path)
@@ -618,16 +805,16 @@ def extract_archive_tool(package_path: str):
 
         elif os.path.isdir(package_path):
             found = False
-            for item in os.listdir(package_path):
-                item_path = os.path.join(package_path, item)
-                if os.path.isfile(item_path):
-                    fmt, _ = get_archive_format(item_path)
-                    if fmt:
-                        archive_path = item_path
-                        archive_file = item
-                        package_dir = package_path
-                        found = True
-                        break
+            with os.scandir(package_path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        fmt, mode = get_archive_format(entry.path)
+                        if fmt:
+                            archive_path = entry.path
+                            archive_file = entry.name
+                            package_dir = package_path
+                            found = True
+                            break
 
             if not found:
                 return f"Error: No supported archive in '{package_path}'"
@@ -637,13 +824,19 @@ def extract_archive_tool(package_path: str):
 
         extract_dir = os.path.join(package_dir, "extracted")
         if os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir)
+            _rmtree_async(extract_dir)
         os.makedirs(extract_dir, exist_ok=True)
 
-        fmt, mode = get_archive_format(archive_path)
         if fmt in ["tar.gz", "tar.xz", "tar.bz2"]:
-            with tarfile.open(archive_path, mode) as tar:
-                tar.extractall(extract_dir)
+            compressor = _external_tar_compressor(fmt)
+            if compressor:
+                subprocess.run(
+                    ["tar", "-I", compressor, "-xf", archive_path, "-C", extract_dir],
+                    check=True,
+                )
+            else:
+                with tarfile.open(archive_path, mode) as tar:
+                    tar.extractall(extract_dir)
         elif fmt == "zip":
             with zipfile.ZipFile(archive_path, "r") as zip_ref:
                 zip_ref.extractall(extract_dir)
@@ -670,14 +863,14 @@ def compress_to_archive_tool(package_path: str):
 
         original_archive = None
         original_fmt = None
-        for item in os.listdir(package_path):
-            item_path = os.path.join(package_path, item)
-            if os.path.isfile(item_path):
-                fmt, _ = get_archive_format(item_path)
-                if fmt:
-                    original_archive = item_path
-                    original_fmt = fmt
-                    break
+        with os.scandir(package_path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    fmt, _ = get_archive_format(entry.path)
+                    if fmt:
+                        original_archive = entry.path
+                        original_fmt = fmt
+                        break
 
         if not original_archive:
             return f"Error: No original archive in '{package_path}'"
@@ -689,18 +882,39 @@ def compress_to_archive_tool(package_path: str):
             os.remove(output_archive)
 
         if original_fmt in ["tar.gz", "tar.xz", "tar.bz2"]:
-            mode = SUPPORTED_FORMATS[original_fmt]["mode"].replace("r", "w")
-            with tarfile.open(output_archive, mode) as tar:
-                for item in os.listdir(extracted_dir):
-                    item_path = os.path.join(extracted_dir, item)
-                    tar.add(item_path, arcname=item)
+            compressor = _external_tar_compressor(original_fmt)
+            entries = os.listdir(extracted_dir)
+            if compressor and entries:
+                subprocess.run(
+                    ["tar", "-I", compressor, "-cf", output_archive]
+                    + ["-C", extracted_dir]
+                    + entries,
+                    check=True,
+                )
+            else:
+                mode = SUPPORTED_FORMATS[original_fmt]["mode"].replace("r", "w")
+                with tarfile.open(output_archive, mode) as tar:
+                    for item in entries:
+                        item_path = os.path.join(extracted_dir, item)
+                        tar.add(item_path, arcname=item)
         elif original_fmt == "zip":
-            with zipfile.ZipFile(output_archive, "w", zipfile.ZIP_DEFLATED) as zip_ref:
-                for root, _, files in os.walk(extracted_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, extracted_dir)
-                        zip_ref.write(file_path, arcname)
+            with zipfile.ZipFile(
+                output_archive, "w", zipfile.ZIP_DEFLATED, compresslevel=1
+            ) as zip_ref:
+                # scandir recursion avoids the per-entry stat of os.walk, and
+                # slicing the known prefix is cheaper than relpath per file
+                prefix_len = len(extracted_dir) + 1
+
+                def _walk(directory):
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                yield from _walk(entry.path)
+                            else:
+                                yield entry.path
+
+                for path in _walk(extracted_dir):
+                    zip_ref.write(path, path[prefix_len:])
 
         shutil.rmtree(extracted_dir)
         return f"Success: Compressed to {output_archive}"
@@ -715,11 +929,10 @@ def upload_file_to_obs_tool(package_path: str):
     if not os.path.isdir(package_path):
         return f"Error: '{package_path}' is not a directory"
 
-    has_spec = any(
-        f.endswith(".spec")
-        for f in os.listdir(package_path)
-        if os.path.isfile(os.path.join(package_path, f))
-    )
+    # Short-circuits on the first .spec; the file-type bit comes from the
+    # directory entry, so no per-file stat is issued
+    with os.scandir(package_path) as it:
+        has_spec = any(e.name.endswith(".spec") and e.is_file() for e in it)
     if not has_spec:
         return f"Error: No .spec file in '{package_path}'"
 
@@ -755,7 +968,7 @@ def get_packages_to_process(base_dir: str, result_dir: str) -> str:
     """
     try:
         if not os.path.exists(base_dir):
-            return json.dumps(
+            return _jd(
                 {
                     "success": False,
                     "message": f"Base directory not found: {base_dir}",
@@ -763,13 +976,10 @@ def get_packages_to_process(base_dir: str, result_dir: str) -> str:
                 }
             )
 
-        packages = [
-            item
-            for item in os.listdir(base_dir)
-            if os.path.isdir(os.path.join(base_dir, item))
-        ]
+        with os.scandir(base_dir) as entries:
+            packages = [entry.name for entry in entries if entry.is_dir()]
 
-        return json.dumps(
+        return _jd(
             {
                 "success": True,
                 "message": f"Found {len(packages)} packages",
@@ -777,7 +987,7 @@ def get_packages_to_process(base_dir: str, result_dir: str) -> str:
             }
         )
     except Exception as e:
-        return json.dumps(
+        return _jd(
             {
                 "success": False,
                 "message": f"Error getting packages: {str(e)}",
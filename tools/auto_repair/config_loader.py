@@ -0,0 +1,23 @@
+import functools
+import os
+
+import yaml
+
+# Prefer the libyaml-backed loader (much faster); fall back to pure Python.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+_CONFIG_PATH = "config/info.yaml"
+
+
+@functools.lru_cache(maxsize=1)
+def _load_info(mtime_ns: int) -> dict:
+    with open(_CONFIG_PATH, "r") as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
+def load_info() -> dict:
+    """Parsed config/info.yaml, re-read only when the file changes."""
+    return _load_info(os.stat(_CONFIG_PATH).st_mtime_ns)
@@ -0,0 +1,23 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# One pooled session shared by every OBS API call: connections stay alive
+# across the status-polling loop and multi-file uploads instead of paying a
+# fresh TCP+TLS handshake per request.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        # Only retry reads. The streamed PUT in upload_files passes an open
+        # file as the body; after the first send it sits at EOF, so a retry
+        # would declare the original Content-Length but send nothing.
+        allowed_methods=frozenset({"GET", "HEAD"}),
+    ),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
@@ -1,8 +1,12 @@
-import yaml
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 from requests.auth import HTTPBasicAuth
 
+from tools.auto_repair.config_loader import load_info
+from tools.auto_repair.http_session import SESSION as _SESSION
+
 
 def upload_file_to_obs(
     obs_url: str,
@@ -29,21 +33,20 @@ def upload_file_to_obs(
     url = f"{obs_url}/source/{project}/{package}/{target_filename}"
 
     try:
-        # Read local file content
+        # Stream the file handle directly: requests reads it in chunks, so
+        # memory stays flat and the disk read overlaps the network send
         with open(local_file_path, "rb") as f:
-            file_content = f.read()
-
-        # Send PUT request to upload file (using Basic Auth)
-        response = requests.put(
-            url,
-            auth=HTTPBasicAuth(username, password),
-            data=file_content,
-            headers={
-                "Content-Type": "application/octet-stream",
-                "Accept": "application/xml",
-            },
-            timeout=600,
-        )
+            response = _SESSION.put(
+                url,
+                auth=HTTPBasicAuth(username, password),
+                data=f,
+                headers={
+                    "Content-Type": "application/octet-stream",
+                    "Content-Length": str(os.path.getsize(local_file_path)),
+                    "Accept": "application/xml",
+                },
+                timeout=600,
+            )
 
         # Handle response
         if response.status_code in (200, 201):
@@ -58,20 +61,31 @@ def upload_file_to_obs(
         return f"Error: Request exception - {str(e)}"
 
 
-def main_upload(package_name, file_name):
+def main_upload(package_name, file_name, prelisted=None):
+    """
+    Upload every file in `file_name` to OBS. `prelisted` lets callers that
+    already scanned the directory pass the (name, path) pairs in, so the
+    tree is not walked a second time.
+    """
     # config info
-    with open("config/info.yaml", "r") as f:
-        infos = yaml.safe_load(f)
+    infos = load_info()
     obs_api_url = infos["user"]["obs_api_url"]
     obs_username = infos["user"]["user_name"]
     obs_password = infos["user"]["password"]
     target_project = infos["user"]["target_project"]
 
-    for file in os.listdir(file_name):
-        print(file)
-        file_path = os.path.join(file_name, file)
-        try:
-            upload_file_to_obs(
+    if prelisted is None:
+        with os.scandir(file_name) as entries:
+            prelisted = [(e.name, e.path) for e in entries if e.is_file()]
+
+    # Uploads are network-latency-bound: overlap them so N files cost about
+    # ceil(N/8) round-trips instead of N. The shared session's pool is sized
+    # to keep the workers from serializing on connections.
+    errors = []
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {
+            executor.submit(
+                upload_file_to_obs,
                 obs_url=obs_api_url,
                 username=obs_username,
                 password=obs_password,
@@ -79,8 +93,16 @@ def main_upload(package_name, file_name):
                 package=package_name,
                 local_file_path=file_path,
                 target_filename=file,
-            )
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            return f"Error: {str(e)}"
+            ): file
+            for file, file_path in prelisted
+        }
+        for fut in as_completed(futures):
+            print(futures[fut])
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"Error: {str(e)}")
+                errors.append(str(e))
+    if errors:
+        return f"Error: {'; '.join(errors)}"
     return f"Success: File {file_name} uploaded to OBS {package_name} successfully."